@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Build a non-conflicting agenda from favourites.
+
+Each wished-for session gets a weight (its priority times a per-level weight) and
+weighted interval scheduling picks the heaviest set of sessions that neither
+overlap nor leave too little time to walk between venues. Sessions that don't
+fit are retried at their repeats (same thirdPartyID before the "-"), and the
+repeats of every scheduled session are listed as alternates.
+"""
+import argparse
+import json
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from catalog_storage import load_sessions
+from conflicts import TravelTimes, is_marked
+from normalize import MISSING, SessionTable, normalize_sessions, to_excel_date
+
+
+def session_prefix(third_party_id: str) -> str:
+    return third_party_id.split("-")[0]
+
+
+class RepeatIndex:
+    """Row numbers of every timed instance of a session, by thirdPartyID prefix."""
+
+    def __init__(self, table: SessionTable):
+        self.rows: Dict[str, List[int]] = defaultdict(list)
+        self.by_id: Dict[str, int] = {}
+        for i, third_party_id in enumerate(table.third_party_id):
+            if table.start_time[i] != MISSING and table.end_time[i] != MISSING:
+                self.rows[session_prefix(third_party_id)].append(i)
+                self.by_id[third_party_id] = i
+        for rows in self.rows.values():
+            rows.sort(key=lambda i: table.start_time[i])
+
+    def instances(self, prefix: str) -> List[int]:
+        return self.rows.get(prefix, [])
+
+
+class Agenda(NamedTuple):
+    owner: str
+    scheduled: List[int]                # row numbers, in time order
+    alternates: Dict[int, List[int]]    # scheduled row -> other instances that also fit
+    unscheduled: List[str]              # wished-for prefixes that could not be fitted
+    weight: float
+
+
+def wishlist_from_table(
+    table: SessionTable,
+    favourite_weight: float = 1.0,
+    aws_favorite_weight: float = 1.0,
+) -> Dict[str, float]:
+    """
+    Priorities by session ID from the spreadsheet Favourite column (a number there is
+    used as the priority, any other mark as favourite_weight) and the portal's
+    isFavorite flag. AWS favourites are keyed by full ID since they mark one instance.
+    """
+    wishes: Dict[str, float] = {}
+    for i in range(len(table)):
+        favourite = table.favourite[i]
+        if is_marked(favourite):
+            priority = favourite if isinstance(favourite, (int, float)) and not isinstance(favourite, bool) else favourite_weight
+            prefix = session_prefix(table.third_party_id[i])
+            wishes[prefix] = max(wishes.get(prefix, 0), priority)
+        if table.is_favorite_aws[i]:
+            third_party_id = table.third_party_id[i]
+            wishes[third_party_id] = max(wishes.get(third_party_id, 0), aws_favorite_weight)
+    return wishes
+
+
+def _best_schedule(
+    table: SessionTable, candidates: List[int], weights: Dict[int, float], travel: TravelTimes
+) -> List[int]:
+    """
+    Weighted interval scheduling with venue travel times.
+
+    Candidates are processed by end time. For each venue we keep the ends of the
+    sessions seen so far and a running best total, so the best compatible predecessor
+    at that venue is one bisect away: it must end travel(venue, here) before this
+    session starts. That keeps the DP exact at O(n x venues x log n).
+    """
+    order = sorted(candidates, key=lambda i: (table.end_time[i], table.start_time[i]))
+    best: Dict[int, float] = {}
+    previous: Dict[int, Optional[int]] = {}
+    venue_ends: Dict[str, List[int]] = defaultdict(list)
+    venue_best: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+
+    for j in order:
+        start, venue = table.start_time[j], table.venue[j]
+        before, before_row = 0.0, None
+        for other_venue, ends in venue_ends.items():
+            k = bisect_right(ends, start - travel.between(other_venue, venue))
+            if k:
+                total, row = venue_best[other_venue][k - 1]
+                if total > before:
+                    before, before_row = total, row
+        best[j] = weights[j] + before
+        previous[j] = before_row
+
+        running = venue_best[venue]
+        entry = (best[j], j)
+        if running and running[-1][0] >= best[j]:
+            entry = running[-1]
+        venue_ends[venue].append(table.end_time[j])
+        running.append(entry)
+
+    if not best:
+        return []
+    row: Optional[int] = max(best, key=best.get)
+    chain = []
+    while row is not None:
+        chain.append(row)
+        row = previous[row]
+    chain.reverse()
+    return chain
+
+
+def _fits(table: SessionTable, schedule: List[int], row: int, travel: TravelTimes) -> bool:
+    start, end, venue = table.start_time[row], table.end_time[row], table.venue[row]
+    for other in schedule:
+        other_start, other_end, other_venue = table.start_time[other], table.end_time[other], table.venue[other]
+        if other_end <= start:
+            if other_end + travel.between(other_venue, venue) > start:
+                return False
+        elif end <= other_start:
+            if end + travel.between(venue, other_venue) > other_start:
+                return False
+        else:
+            return False
+    return True
+
+
+def plan_agenda(
+    table: SessionTable,
+    repeats: RepeatIndex,
+    wishes: Dict[str, float],
+    travel: Optional[TravelTimes] = None,
+    level_weights: Optional[Dict[int, float]] = None,
+    owner: str = "",
+) -> Agenda:
+    """
+    Plan one person's agenda. `wishes` maps a session prefix (any instance will do) or a
+    full thirdPartyID (that instance first) to its priority.
+    """
+    travel = travel or TravelTimes()
+    level_weights = level_weights or {}
+
+    # The priority of every prefix, and the instance that should be tried first
+    priorities: Dict[str, float] = {}
+    preferred: Dict[str, int] = {}
+    for key, priority in wishes.items():
+        prefix = session_prefix(key)
+        if key in repeats.by_id and key != prefix:
+            preferred[prefix] = repeats.by_id[key]
+        priorities[prefix] = max(priorities.get(prefix, 0), priority)
+
+    weights: Dict[int, float] = {}
+    for prefix, priority in priorities.items():
+        for i in repeats.instances(prefix):
+            weight = priority * level_weights.get(table.session_level[i], 1.0)
+            # A small bonus steers the DP to the instance that was explicitly picked
+            weights[i] = weight * (1.001 if preferred.get(prefix) == i else 1.0)
+
+    # The DP may pick two instances of the same session; keep the first, then refill
+    scheduled: List[int] = []
+    covered = set()
+    for row in _best_schedule(table, list(weights), weights, travel):
+        prefix = session_prefix(table.third_party_id[row])
+        if prefix not in covered:
+            covered.add(prefix)
+            scheduled.append(row)
+
+    unscheduled = []
+    for prefix in sorted(priorities, key=lambda p: -priorities[p]):
+        if prefix in covered:
+            continue
+        for row in repeats.instances(prefix):
+            if _fits(table, scheduled, row, travel):
+                scheduled.append(row)
+                covered.add(prefix)
+                break
+        else:
+            unscheduled.append(prefix)
+
+    scheduled.sort(key=lambda i: table.start_time[i])
+    alternates = {}
+    for row in scheduled:
+        others = [s for s in scheduled if s != row]
+        alternates[row] = [
+            alt for alt in repeats.instances(session_prefix(table.third_party_id[row]))
+            if alt != row and _fits(table, others, alt, travel)
+        ]
+    total = sum(weights[row] for row in scheduled if row in weights)
+    return Agenda(owner, scheduled, alternates, unscheduled, total)
+
+
+def plan_team(
+    table: SessionTable,
+    wishlists: Dict[str, Dict[str, float]],
+    travel: Optional[TravelTimes] = None,
+    level_weights: Optional[Dict[int, float]] = None,
+) -> List[Agenda]:
+    """Plan an agenda for each person in `wishlists`, sharing one repeat index."""
+    repeats = RepeatIndex(table)
+    return [
+        plan_agenda(table, repeats, wishes, travel, level_weights, owner)
+        for owner, wishes in wishlists.items()
+    ]
+
+
+def agenda_to_json(table: SessionTable, agenda: Agenda) -> Dict:
+    def describe(row: int) -> Dict:
+        return {
+            "ID": table.third_party_id[row],
+            "Title": table.title[row],
+            "Venue": table.venue[row],
+            "StartTime": to_excel_date(table.start_time[row]),
+            "EndTime": to_excel_date(table.end_time[row]),
+        }
+
+    return {
+        "owner": agenda.owner,
+        "weight": agenda.weight,
+        "sessions": [
+            {**describe(row), "alternates": [describe(alt) for alt in agenda.alternates[row]]}
+            for row in agenda.scheduled
+        ],
+        "unscheduled": agenda.unscheduled,
+    }
+
+
+def parse_level_weight(value: str) -> Tuple[int, float]:
+    level, _, weight = value.partition("=")
+    level_number = int(level)
+    # Accept both 300 and 3 for a level-300 session
+    return (level_number // 100 if level_number >= 100 else level_number), float(weight)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Build the highest-priority agenda without clashes from your favourites (the Favourite column of a workbook and/or AWS portal favourites), or from a team's wishlists.")
+    parser.add_argument("source_file", nargs='?', default="", help="Workbook whose Favourite column holds your wishes (optional); numbers are used as priorities")
+    parser.add_argument("--sessions", default="sessions.json", help="Catalog written by download.py (default: sessions.json)")
+    parser.add_argument("--wishlists", help='JSON file of {"person": {"ARC301": 2, "SVS402-R1": 1}} to plan a whole team instead')
+    parser.add_argument("--travel-times", help='JSON file of walking minutes between venues, e.g. {"Venetian": {"Wynn": 20}}')
+    parser.add_argument("--default-travel", type=float, default=0, help="Walking minutes assumed between venues missing from --travel-times (default: 0)")
+    parser.add_argument("--level-weight", type=parse_level_weight, action="append", default=[], help="Multiply the priority of a level, e.g. 300=1.5 (repeatable)")
+    parser.add_argument("--favourite-weight", type=float, default=1.0, help="Priority of a non-numeric Favourite mark (default: 1)")
+    parser.add_argument("--aws-favorite-weight", type=float, default=1.0, help="Priority of a portal favourite (default: 1)")
+    parser.add_argument("--output", default="agenda.json", help="Where to write the agenda(s) (default: agenda.json)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    favourites_data, is_selected_data = {}, {}
+    if args.source_file:
+        from display import read_excel_source
+        favourites_data, is_selected_data = read_excel_source(args.source_file)
+    table = normalize_sessions(load_sessions(args.sessions), favourites_data, is_selected_data)
+
+    if args.travel_times:
+        travel = TravelTimes.load(args.travel_times, args.default_travel)
+    else:
+        travel = TravelTimes(default=args.default_travel)
+
+    if args.wishlists:
+        with open(args.wishlists, "r") as f:
+            wishlists = json.load(f)
+    else:
+        wishlists = {"": wishlist_from_table(table, args.favourite_weight, args.aws_favorite_weight)}
+
+    agendas = plan_team(table, wishlists, travel, dict(args.level_weight))
+    for agenda in agendas:
+        if agenda.owner:
+            print(f"\n{agenda.owner}")
+        for row in agenda.scheduled:
+            print(f"  {to_excel_date(table.start_time[row])}  {table.third_party_id[row]:<12} {table.venue[row]:<14} {table.title[row]}")
+        if agenda.unscheduled:
+            print(f"  Could not fit: {', '.join(agenda.unscheduled)}")
+
+    with open(args.output, "w") as f:
+        json.dump([agenda_to_json(table, agenda) for agenda in agendas], f, indent=4)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Download the catalog once plus the favorites of every account in a credentials file.
+
+Accounts are logged in and queried on a bounded thread pool, and every request to
+the same host (hub, storage API, Cognito) is spaced by one shared rate limiter, so
+a large team does not hammer the portal. The result is the usual sessions file
+and a favorites matrix with one row per session and one column per person.
+"""
+import csv
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+import click
+
+from catalog_storage import save_sessions
+from credential_cache import CredentialCache, DEFAULT_CACHE_DIR
+from download import SESSIONS_FILE, HubClient, fetch_favorites, fetch_sessions
+from normalize import SessionTable, normalize_sessions, to_excel_date
+from rate_limit import RateLimiter
+from srp.ephemeral import EphemeralPool
+from transport import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+
+def load_credentials(path: str) -> List[Dict[str, str]]:
+    """
+    Accounts from a CSV file with username,password[,name] columns, or a JSON list
+    of {"username", "password", "name"} objects. `name` defaults to the username.
+    """
+    with open(path, "r", newline="") as f:
+        if path.endswith(".json"):
+            accounts = json.load(f)
+        else:
+            accounts = list(csv.DictReader(f))
+
+    names = set()
+    for account in accounts:
+        if not account.get("username") or not account.get("password"):
+            raise ValueError(f"{path}: every account needs a username and a password")
+        account["name"] = account.get("name") or account["username"]
+        if account["name"] in names:
+            raise ValueError(f"{path}: duplicate account name {account['name']!r}")
+        names.add(account["name"])
+    return accounts
+
+
+class SharedCatalog:
+    """
+    The catalog, downloaded once for the whole batch by the first account that gets
+    to it after logging in. If that download fails, the next account tries again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sessions: Optional[List[Dict]] = None
+        self.errors: List[str] = []
+
+    def fetch(self, client: HubClient, name: str) -> None:
+        # Held for the whole download, so later accounts wait for it instead of repeating it
+        with self._lock:
+            if self.sessions is not None:
+                return
+            try:
+                self.sessions = fetch_sessions(client)
+            except Exception as e:
+                logger.warning(f"{name}: could not download the catalog: {e}")
+                self.errors.append(f"{name}: {e}")
+                return
+        logger.info(f"{name}: downloaded the catalog ({len(self.sessions)} sessions)")
+
+
+def fetch_account(
+    account: Dict[str, str],
+    limiter: RateLimiter,
+    breaker: CircuitBreaker,
+    ephemeral_pool: EphemeralPool,
+    cache_dir: Optional[str] = None,
+    catalog: Optional[SharedCatalog] = None,
+    cognito: str = "boto3",
+) -> Set[str]:
+    """
+    Log one account in and return the scheduleUids of its favorites. With `catalog`,
+    the account also downloads the catalog if no other account has yet.
+    """
+    cache = CredentialCache(account["username"], account["password"], cache_dir) if cache_dir else None
+    with HubClient(
+        account["username"], account["password"], cache, limiter,
+        breaker=breaker, ephemeral_pool=ephemeral_pool, cognito=cognito,
+    ) as client:
+        client.ensure_logged_in()
+        favorites = fetch_favorites(client)
+        if catalog is not None:
+            catalog.fetch(client, account["name"])
+    uids = {favorite["scheduleUid"] for favorite in favorites.get("followedSessions", [])}
+    logger.info(f"{account['name']}: {len(uids)} favorites")
+    return uids
+
+
+def write_favorites_matrix(
+    path: str, table: SessionTable, favorites: Dict[str, Set[str]], favorites_only: bool = False
+) -> int:
+    """
+    Write a CSV with one row per session and a column per person (1 where that person
+    favourited the session), plus the number of people who did. Returns the row count.
+    """
+    names = list(favorites)
+    count = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID", "Title", "Venue", "StartTime", "Count", *names])
+        for i in range(len(table)):
+            schedule_uid = table.schedule_uid[i]
+            marks = [schedule_uid in favorites[name] for name in names]
+            if favorites_only and not any(marks):
+                continue
+            writer.writerow([
+                table.third_party_id[i],
+                table.title[i],
+                table.venue[i],
+                to_excel_date(table.start_time[i]),
+                sum(marks),
+                *(1 if mark else "" for mark in marks),
+            ])
+            count += 1
+    return count
+
+
+def favorites_to_wishlists(sessions: List[Dict], favorites: Dict[str, Set[str]]) -> Dict[str, Dict[str, float]]:
+    """Favorites in the {"person": {"thirdPartyID": priority}} form read by agenda.py --wishlists."""
+    ids = {session["scheduleUid"]: session["thirdPartyID"] for session in sessions}
+    return {
+        name: {ids[uid]: 1 for uid in sorted(uids) if uid in ids}
+        for name, uids in favorites.items()
+    }
+
+
+@click.command()
+@click.argument("credentials_file")
+@click.option(
+    "--output", default=SESSIONS_FILE, show_default=True,
+    help='Where to save the catalog (every session with isFavorite false). The format follows the extension.'
+)
+@click.option(
+    "--matrix", default="favorites_matrix.csv", show_default=True,
+    help='Where to write the sessions x people favorites matrix.'
+)
+@click.option(
+    "--wishlists", default=None,
+    help='Also write everyone\'s favorites as a JSON file for agenda.py --wishlists.'
+)
+@click.option(
+    "--favorites-only/--all-sessions", default=False, show_default=True,
+    help='Only put sessions that somebody favourited in the matrix.'
+)
+@click.option(
+    "--workers", default=4, show_default=True,
+    help='Accounts logged in and queried at the same time.'
+)
+@click.option(
+    "--rate", default=5.0, show_default=True,
+    help='Most requests per second sent to any one host, across all workers (0 for no limit).'
+)
+@click.option(
+    "--cache-credentials/--no-cache-credentials", default=False,
+    help='Keep each account\'s hub cookies and Cognito tokens in the encrypted local cache between runs.'
+)
+@click.option(
+    "--cache-dir", default=DEFAULT_CACHE_DIR, show_default=True,
+    help='Directory for the encrypted credential cache.'
+)
+@click.option(
+    "--cognito-client", type=click.Choice(["boto3", "http"]), default="boto3", show_default=True,
+    help='Log in to Cognito through boto3, or through a small built-in HTTP client that starts much faster.'
+)
+def main(credentials_file, output, matrix, wishlists, favorites_only, workers, rate, cache_credentials, cache_dir, cognito_client):
+    accounts = load_credentials(credentials_file)
+    if not accounts:
+        raise click.UsageError(f"No accounts in {credentials_file}")
+
+    limiter = RateLimiter(rate)
+    # Shared, so that once the hub is known to be struggling no account keeps hitting it
+    breaker = CircuitBreaker()
+    # SRP ephemerals are computed in the background while the first logins go through the redirects
+    ephemeral_pool = EphemeralPool(size=min(len(accounts), 16)).start()
+    cache = cache_dir if cache_credentials else None
+    logger.info(f"Retrieving the catalog and the favorites of {len(accounts)} accounts...")
+
+    # Whichever account logs in first also downloads the catalog; the others only fetch their favorites
+    catalog = SharedCatalog()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            account["name"]: pool.submit(
+                fetch_account, account, limiter, breaker, ephemeral_pool, cache, catalog, cognito_client
+            )
+            for account in accounts
+        }
+        favorites: Dict[str, Set[str]] = {}
+        failed: Dict[str, str] = {}
+        for name, future in futures.items():
+            try:
+                favorites[name] = future.result()
+            except Exception as e:
+                logger.error(f"{name}: {e}")
+                failed[name] = str(e)
+                # Keeps their (empty) column in the matrix
+                favorites[name] = set()
+
+    sessions_data = catalog.sessions
+    if sessions_data is None:
+        errors = catalog.errors or [f"{name}: {error}" for name, error in failed.items()]
+        raise click.ClickException("Could not download the catalog with any account:\n" + "\n".join(errors))
+
+    # Favourites are per person here, so the shared catalog carries none
+    for session in sessions_data:
+        session["isFavorite"] = False
+    sessions = sorted(sessions_data, key=lambda d: d['title'])
+
+    logger.info("Saving sessions...")
+    save_sessions(output, sessions)
+    table = normalize_sessions(sessions, {}, {})
+    rows = write_favorites_matrix(matrix, table, favorites, favorites_only)
+    logger.info(f" - {rows} sessions x {len(favorites)} people written to {matrix}")
+    if wishlists:
+        with open(wishlists, "w") as f:
+            fetched = {name: uids for name, uids in favorites.items() if name not in failed}
+            json.dump(favorites_to_wishlists(sessions, fetched), f, indent=4)
+
+    if failed:
+        raise click.ClickException(
+            "Could not fetch the favorites of (their matrix column is empty):\n"
+            + "\n".join(f"{name}: {error}" for name, error in failed.items())
+        )
+    logger.info("Done!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Time the whole download.py -> display.py pipeline against benchmarks/mock_hub.py.
+
+Each stage runs in its own process, so its peak memory (max RSS) is measured on
+its own; the best wall time of --repeat runs is reported.
+
+    python -m benchmarks.bench_end_to_end --sessions 5000 20000 --latency 0.02
+"""
+import argparse
+import json
+import os
+import resource
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.mock_hub import DEFAULT_USERS, MockHub
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USERNAME, PASSWORD = next(iter(DEFAULT_USERS.items()))
+LOGIN = ["--username", USERNAME, "--password", PASSWORD]
+
+# name -> command line, run in a scratch directory in this order
+STAGES: Dict[str, List[str]] = {
+    "download": ["download.py", *LOGIN],
+    "download --sequential": ["download.py", *LOGIN, "--sequential"],
+    "download --stream": ["download.py", *LOGIN, "--stream", "--output", "streamed.json"],
+    "download .min.json": ["download.py", *LOGIN, "--output", "sessions.min.json"],
+    "display": ["display.py"],
+    "display --split": ["display.py", "--split", "track,day,venue,type"],
+}
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(argv: List[str]) -> None:
+    """Run a script as __main__ in this process and print its wall time and peak RSS."""
+    script = os.path.join(REPO_ROOT, argv[0])
+    sys.argv = [script, *argv[1:]]
+    start = time.perf_counter()
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            raise
+    print(json.dumps({"seconds": time.perf_counter() - start, "peak_rss_mb": peak_rss_mb()}))
+
+
+def run_stage(argv: List[str], cwd: str, env: Dict[str, str]) -> Tuple[float, float]:
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_end_to_end", "--child", *argv],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} failed:\n{result.stderr[-2000:]}")
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    return measured["seconds"], measured["peak_rss_mb"]
+
+
+def bench(count: int, latency: float, repeat: int, stages: List[str]) -> None:
+    with MockHub(sessions=count, latency=latency) as hub, tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, **hub.env(), "PYTHONPATH": REPO_ROOT}
+        print(f"\n{count} sessions, {latency * 1000:.0f} ms latency")
+        print(f"{'stage':<24}{'time (s)':>10}{'peak RSS (MB)':>15}{'requests':>10}")
+        for name in stages:
+            best, peak = float("inf"), 0.0
+            requests_before = hub.requests
+            for _ in range(repeat):
+                seconds, rss = run_stage(STAGES[name], tmp, env)
+                best, peak = min(best, seconds), max(peak, rss)
+            requests = (hub.requests - requests_before) // repeat
+            print(f"{name:<24}{best:>10.3f}{peak:>15.1f}{requests:>10}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        run_child(sys.argv[2:])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[5000, 20000], help="Catalog sizes to test")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds the mock hub adds to every request")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES), help="Stages to run, in order")
+    args = parser.parse_args()
+    for count in args.sessions:
+        bench(count, args.latency, args.repeat, args.stages)
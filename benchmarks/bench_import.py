@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Cold-start cost of download.py: time and peak memory to import it and create a
+Cognito client, with boto3 and with the built-in HTTP client (srp.cognito_http).
+Every case runs in a fresh interpreter.
+
+    python -m benchmarks.bench_import --repeat 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    "python (baseline)": "pass",
+    "import boto3": "import boto3",
+    "import download": "import download",
+    "download + boto3 client": "import download; download.cognito_client('boto3')",
+    "download + http client": "import download; download.cognito_client('http')",
+}
+
+CHILD = """
+import resource, sys, time
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(seconds, peak / (1 << 20) if sys.platform == "darwin" else peak / 1024, "boto3" in sys.modules)
+"""
+
+
+def measure(code: str):
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD.format(code=code)],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        env={**os.environ, "PYTHONPATH": REPO_ROOT},
+    )
+    seconds, rss, boto3_loaded = result.stdout.split()[-3:]
+    return float(seconds), float(rss), boto3_loaded == "True"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Best of N fresh interpreters")
+    args = parser.parse_args()
+
+    print(f"{'case':<26}{'import (ms)':>12}{'peak RSS (MB)':>15}{'boto3 loaded':>14}")
+    for name, code in CASES.items():
+        runs = [measure(code) for _ in range(args.repeat)]
+        seconds = min(r[0] for r in runs)
+        rss = min(r[1] for r in runs)
+        print(f"{name:<26}{seconds * 1000:>12.0f}{rss:>15.1f}{str(runs[0][2]):>14}")
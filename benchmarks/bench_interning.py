@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Memory and output size with and without dictionary encoding of the repeated columns.
+
+    python -m benchmarks.bench_interning --sessions 20000 100000
+
+Memory is what tracemalloc still counts once the raw sessions are gone, i.e. what a
+column (or a loaded catalog) keeps alive. "plain" is the list-of-strings layout
+normalize_sessions used before Venue, Day, TrackName, Type and Tags were interned.
+"""
+import argparse
+import gc
+import os
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import xlsx_parts
+from benchmarks.synthetic import make_sessions
+from catalog_storage import load_sessions, save_sessions
+from display import COLUMN_NAMES, COLUMNS
+from normalize import normalize_sessions
+from sheet_export import export_workbook
+
+
+def plain_columns(sessions: List[Dict]) -> Dict[str, List[str]]:
+    columns: Dict[str, List[str]] = {"type": [], "track": [], "venue": [], "day": [], "tags": []}
+    for session in sessions:
+        columns["type"].append(session["sessionType"])
+        columns["track"].append(session["trackName"])
+        venue = day = ""
+        simple_tags = []
+        for tag in session["tags"]:
+            if tag["parentTagName"] == "Venue":
+                venue = tag["tagName"]
+            elif tag["parentTagName"] == "Day":
+                day = tag["tagName"]
+            simple_tags.append(tag["parentTagName"].replace(" ", "_").lower() + ": " + tag["tagName"] + ", ")
+        columns["venue"].append(venue)
+        columns["day"].append(day)
+        columns["tags"].append("".join(simple_tags))
+    return columns
+
+
+def interned_columns(sessions: List[Dict]) -> Dict[str, object]:
+    # Only the five columns (and their string tables) outlive the table
+    table = normalize_sessions(sessions, {}, {})
+    return {
+        "type": table.session_type,
+        "track": table.track_name,
+        "venue": table.venue,
+        "day": table.day,
+        "tags": table.tags,
+    }
+
+
+def retained(load: Callable[[], List[Dict]], build: Optional[Callable[[List[Dict]], object]] = None) -> float:
+    """MB still allocated after loading (and building from) the catalog and dropping the raw sessions."""
+    gc.collect()
+    tracemalloc.start()
+    sessions = load()
+    result = build(sessions) if build is not None else sessions
+    del sessions
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / 1e6
+
+
+def bench(count: int) -> None:
+    print(f"\n{count} sessions")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {ext: os.path.join(tmp, "sessions" + ext) for ext in (".min.json", ".interned.json", ".sqlite")}
+        sessions = make_sessions(count)
+        for path in paths.values():
+            save_sessions(path, sessions)
+        del sessions
+        source = paths[".min.json"]
+
+        print("Memory kept (MB)")
+        plain = retained(lambda: load_sessions(source), plain_columns)
+        interned = retained(lambda: load_sessions(source), interned_columns)
+        print(f"  Type/TrackName/Venue/Day/Tags columns  plain {plain:8.1f}  interned {interned:8.1f}")
+        print(f"  normalize_sessions table               {retained(lambda: load_sessions(source), lambda s: normalize_sessions(s, {}, {})):8.1f}")
+        for ext, path in paths.items():
+            print(f"  loaded catalog {ext:<22}  {retained(lambda: load_sessions(path)):8.1f}")
+
+        print("Size (MB)")
+        for ext, path in paths.items():
+            print(f"  {'sessions' + ext:<38}  {os.path.getsize(path) / 1e6:8.2f}")
+        table = normalize_sessions(load_sessions(source), {}, {})
+        inline_path = os.path.join(tmp, "inline.xlsx")
+        xlsx_parts.write_workbook(
+            inline_path, [("ALL", COLUMNS, (xlsx_parts.row_xml(row) for row in table.rows(COLUMN_NAMES)))]
+        )
+        shared_path = os.path.join(tmp, "shared.xlsx")
+        export_workbook(shared_path, table, COLUMNS, (), 1)
+        print(f"  {'reinvent.xlsx, inline strings':<38}  {os.path.getsize(inline_path) / 1e6:8.2f}")
+        print(f"  {'reinvent.xlsx, shared strings':<38}  {os.path.getsize(shared_path) / 1e6:8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[20000, 100000], help="Catalog sizes to test")
+    args = parser.parse_args()
+    for count in args.sessions:
+        bench(count)
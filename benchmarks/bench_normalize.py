@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Compare display.py's original per-session parse_sessions, kept below as it was,
+with the batched normalize.normalize_sessions.
+
+    python -m benchmarks.bench_normalize --sessions 5000 50000 500000
+"""
+import argparse
+import contextlib
+import copy
+import io
+import time
+from datetime import datetime, timezone
+
+import pytz
+
+from benchmarks.synthetic import make_sessions
+from normalize import normalize_sessions
+
+
+def to_excel_date( d ):
+    if d != None:
+        return d.strftime('%x %X')
+    else:
+        return None
+
+
+def add_item( dfs, type, session ):
+
+    category = dfs.get(type, None)
+    if category is None:
+        category = []
+        dfs[type] = category
+
+    item = {}
+    item["selected"] = session['selected']
+    item["Favourite"] = session['favourite']
+    item["FavoriteAWS"] = session['isFavorite']
+    item["IsNew"] = session['isNew']
+    item["ID"] = session['thirdPartyID']
+    item["Title"] = session['title']
+    item["SessionLevel"] = session['sessionLevel']
+    item["Description"] = session['description']
+    item["Type"] = session['sessionType']
+    item["TrackName"] = session['trackName']
+    item["Venue"] = session['venue']
+    item["Day"] = session['day']
+    item["StartTime"] = to_excel_date(session['startTime'])
+    item["EndTime"] = to_excel_date(session['endTime'])
+    item["scheduleUid"] = session['scheduleUid']
+    item["sessionUid"] = session['sessionUid']
+    
+    simple_tag_name = ""
+    for t in session['tags']:
+        simple_tag_name = simple_tag_name + t['parentTagName'].replace(" ", "_").lower() + ": " + t['tagName'] + ", "
+    item["Tags"] = simple_tag_name
+    
+    category.append(item)
+
+    
+def parse_sessions(sessions, favourites, is_selected_data):
+    items = {}
+    print( f"There are currently {len(sessions)} sessions" )
+
+    # Display the sessionType, trackName, thirdPartyID, title, and description for each session
+    for session in sessions:
+
+        type = session['sessionType']
+        
+        # Update Favourites
+        dest_id = session['thirdPartyID'].split("-")[0]
+        session["favourite"] = favourites[dest_id] if dest_id in favourites else ""
+
+        # Update selected
+        dest_id = session['thirdPartyID']
+        session["selected"] = is_selected_data[dest_id] if dest_id in is_selected_data else ""
+
+        # Update IsNew
+        session["isNew"] = False if dest_id in is_selected_data else True
+
+        # Clean up date/times
+        startTime = session['startDateTime']
+        endTime = session['endDateTime']
+        if startTime != "":
+            startTime = datetime.fromtimestamp(startTime, timezone.utc).astimezone(pytz.timezone('America/Los_Angeles'))
+        else:
+            startTime = None
+        if endTime != "":
+            endTime = datetime.fromtimestamp(endTime, timezone.utc).astimezone(pytz.timezone('America/Los_Angeles'))
+        else:
+            endTime = None
+
+        session["startTime"] = startTime
+        session["endTime"] = endTime
+
+        # Extract session level
+        if len(session['thirdPartyID']) >= 4:
+            session_level = int(session['thirdPartyID'][3])
+        else:
+            session_level = 0
+        session["sessionLevel"] = session_level
+
+        # Get venue and date from tags
+        # each tag has a parentTagName of either Venue or Day
+        # and we want the tagName
+        venue = ""
+        day = ""
+        for tag in session['tags']:
+            if tag['parentTagName'] == "Venue":
+                venue = tag['tagName']
+            if tag['parentTagName'] == "Day":
+                day = tag['tagName']
+
+        session["venue"] = venue
+        session["day"] = day
+
+        add_item( items, "ALL", session )
+    return items
+
+
+def bench(count: int) -> None:
+    sessions = make_sessions(count)
+    ids = [s["thirdPartyID"] for s in sessions]
+    favourites = {i.split("-")[0]: "x" for i in ids[::10]}
+    is_selected_data = {i: "y" for i in ids[::20]}
+
+    # parse_sessions adds keys to the session dicts, so give it its own copy
+    loop_input = copy.deepcopy(sessions)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        items = parse_sessions(loop_input, favourites, is_selected_data)
+    loop_time = time.perf_counter() - start
+    del loop_input
+
+    start = time.perf_counter()
+    table = normalize_sessions(sessions, favourites, is_selected_data)
+    batch_time = time.perf_counter() - start
+
+    assert len(table) == len(items["ALL"])
+    assert next(table.items()) == items["ALL"][0]
+
+    print(f"{count:>8} sessions  parse_sessions {loop_time:7.3f}s  normalize_sessions {batch_time:7.3f}s  "
+          f"speedup {loop_time / batch_time:4.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[5000, 50000, 500000], help="Catalog sizes to test")
+    args = parser.parse_args()
+    for count in args.sessions:
+        bench(count)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Time the client side of the SRP login: the hex-string arithmetic the code used
+to do against the srp.constants byte helpers, and a cold ephemeral against one
+taken from a warm EphemeralPool. Results are checked to match before timing.
+
+    python -m benchmarks.bench_srp --repeat 50
+"""
+import argparse
+import time
+
+from benchmarks.mock_hub import USER_POOL_ID, SrpServer
+from srp import aws_srp, constants
+from srp.aws_srp import AWSSRP
+from srp.ephemeral import EphemeralPool
+
+USERNAME, PASSWORD = "bench", "bench-password"
+
+
+def hex_constants():
+    # What every AWSSRP.__init__ used to do
+    big_n = aws_srp.hex_to_long(aws_srp.n_hex)
+    g = aws_srp.hex_to_long(aws_srp.g_hex)
+    k = aws_srp.hex_to_long(aws_srp.hex_hash('00' + aws_srp.n_hex + '0' + aws_srp.g_hex))
+    return big_n, g, k
+
+
+def hex_calculate_u(big_a, big_b):
+    return aws_srp.hex_to_long(aws_srp.hex_hash(aws_srp.pad_hex(big_a) + aws_srp.pad_hex(big_b)))
+
+
+def hex_authentication_key(srp, username, password, server_b_value, salt):
+    big_n, g, k = hex_constants()
+    u_value = hex_calculate_u(srp.large_a_value, server_b_value)
+    username_password = '%s%s:%s' % (srp.pool_id.split('_')[1], username, password)
+    username_password_hash = aws_srp.hash_sha256(username_password.encode('utf-8'))
+    x_value = aws_srp.hex_to_long(aws_srp.hex_hash(aws_srp.pad_hex(salt) + username_password_hash))
+    g_mod_pow_xn = pow(g, x_value, big_n)
+    int_value2 = server_b_value - k * g_mod_pow_xn
+    s_value = pow(int_value2, srp.small_a_value + u_value * x_value, big_n)
+    return aws_srp.compute_hkdf(bytearray.fromhex(aws_srp.pad_hex(s_value)),
+                                bytearray.fromhex(aws_srp.pad_hex(aws_srp.long_to_hex(u_value))))
+
+
+def best_of(repeat, call):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(repeat):
+    server = SrpServer(USER_POOL_ID, {USERNAME: PASSWORD})
+    srp = AWSSRP(USERNAME, PASSWORD, USER_POOL_ID, "client", client=object())
+    challenge = server.start(USERNAME, aws_srp.long_to_hex(srp.large_a_value))
+    big_b = aws_srp.hex_to_long(challenge["SRP_B"])
+    salt = challenge["SALT"]
+
+    assert hex_constants() == (srp.big_n, srp.g, srp.k)
+    assert hex_calculate_u(srp.large_a_value, big_b) == aws_srp.calculate_u(srp.large_a_value, big_b)
+    assert hex_authentication_key(srp, USERNAME, PASSWORD, big_b, salt) == \
+        srp.get_password_authentication_key(USERNAME, PASSWORD, big_b, salt)
+    assert server.verify(srp.process_challenge(challenge)) == USERNAME
+
+    pool = EphemeralPool(size=repeat).start()
+    while pool.ready() < repeat:
+        time.sleep(0.01)
+
+    rows = [
+        ("group constants", best_of(repeat, hex_constants), 0.0),
+        ("calculate_u",
+         best_of(repeat, lambda: hex_calculate_u(srp.large_a_value, big_b)),
+         best_of(repeat, lambda: aws_srp.calculate_u(srp.large_a_value, big_b))),
+        ("authentication key",
+         best_of(repeat, lambda: hex_authentication_key(srp, USERNAME, PASSWORD, big_b, salt)),
+         best_of(repeat, lambda: srp.get_password_authentication_key(USERNAME, PASSWORD, big_b, salt))),
+        ("AWSSRP() ephemeral",
+         best_of(repeat, lambda: AWSSRP(USERNAME, PASSWORD, USER_POOL_ID, "client", client=object())),
+         best_of(repeat, lambda: AWSSRP(USERNAME, PASSWORD, USER_POOL_ID, "client", client=object(), ephemeral_pool=pool))),
+    ]
+    print(f"{'step':<22}{'before (ms)':>12}{'after (ms)':>12}")
+    for name, before, after in rows:
+        print(f"{name:<22}{before:>12.3f}{after:>12.3f}")
+    print("(before for AWSSRP() is the cold path, after takes a pair from a warm EphemeralPool)")
+    print(f"gmpy2: {'used' if constants._powmod is not None else 'not installed'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50, help="Best of N runs")
+    main(parser.parse_args().repeat)
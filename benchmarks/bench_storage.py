@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Compare save time, load time and file size of the catalog storage backends.
+
+    python -m benchmarks.bench_storage --sessions 5000 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import make_sessions
+from catalog_storage import BACKENDS
+
+
+def bench(count: int, repeat: int) -> None:
+    sessions = make_sessions(count)
+    print(f"\n{count} sessions")
+    print(f"{'format':<14}{'save (s)':>10}{'load (s)':>10}{'size (MB)':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in BACKENDS:
+            path = os.path.join(tmp, "sessions" + backend.extensions[0])
+            try:
+                start = time.perf_counter()
+                backend.save(path, sessions)
+                save_time = time.perf_counter() - start
+            except RuntimeError as e:
+                print(f"{backend.name:<14}skipped: {e}")
+                continue
+
+            load_time = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                loaded = backend.load(path)
+                load_time = min(load_time, time.perf_counter() - start)
+            assert len(loaded) == count
+
+            size = os.path.getsize(path) / 1e6
+            print(f"{backend.name:<14}{save_time:>10.3f}{load_time:>10.3f}{size:>11.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[5000, 20000], help="Catalog sizes to test")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N loads")
+    args = parser.parse_args()
+    for count in args.sessions:
+        bench(count, args.repeat)
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the attendee hub, the storage API and Cognito, so download.py
+can be run (and timed) without the real services.
+
+It implements the login redirect chain, the storage call, the cookie exchange,
+the user, favorites and sessions list APIs (with ETag support) and the Cognito
+InitiateAuth/RespondToAuthChallenge calls, including the server side of the SRP
+handshake, so a wrong password is rejected just like the real thing. Sessions come
+from benchmarks.synthetic; each request can be delayed and a share of them can be
+answered with 503 to exercise the retries.
+
+    python -m benchmarks.mock_hub --port 8080 --sessions 20000 --latency 0.05
+    eval "$(python -m benchmarks.mock_hub --print-env --port 8080)"
+    python download.py --username bench --password bench-password
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.synthetic import make_sessions
+from srp.aws_srp import (
+    calculate_u,
+    compute_hkdf,
+    get_random,
+    hash_sha256,
+    hex_hash,
+    hex_to_long,
+    long_to_hex,
+    pad_hex,
+)
+from srp.constants import BIG_N, G, K
+
+USER_POOL_ID = "us-east-1_iu3YTdfT3"
+DEFAULT_USERS = {"bench": "bench-password"}
+COOKIE_NAME = "hub_session"
+TOKEN_LIFETIME = 3600
+
+
+def hub_env(url: str) -> Dict[str, str]:
+    """Environment variables that point download.py at a mock hub at `url`."""
+    return {
+        "REINVENT_HUB_URL": url,
+        "REINVENT_STORAGE_URL": f"{url}/storage",
+        "REINVENT_COGNITO_URL": f"{url}/cognito",
+    }
+
+
+def make_token(kind: str, lifetime: int = TOKEN_LIFETIME) -> str:
+    """A JWT-shaped token whose exp claim credential_cache.token_expired can read."""
+
+    def part(value: Dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b"=").decode()
+
+    claims = {"exp": int(time.time()) + lifetime, "token_use": kind, "jti": secrets.token_hex(8)}
+    return f"{part({'alg': 'none'})}.{part(claims)}.{secrets.token_hex(16)}"
+
+
+class SrpServer:
+    """Cognito's side of USER_SRP_AUTH, matching the client in srp/aws_srp.py."""
+
+    def __init__(self, pool_id: str, users: Dict[str, str]):
+        self.pool_name = pool_id.split("_")[1]
+        self.users = users
+        self.big_n = BIG_N
+        self.g = G
+        self.k = K
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple] = {}
+
+    def verifier(self, username: str, salt_hex: str) -> int:
+        password_hash = hash_sha256(f"{self.pool_name}{username}:{self.users[username]}".encode("utf-8"))
+        x_value = hex_to_long(hex_hash(pad_hex(salt_hex) + password_hash))
+        return pow(self.g, x_value, self.big_n)
+
+    def start(self, username: str, srp_a_hex: str) -> Optional[Dict]:
+        """The PASSWORD_VERIFIER challenge parameters, or None for an unknown user."""
+        big_a = hex_to_long(srp_a_hex)
+        if username not in self.users or big_a % self.big_n == 0:
+            return None
+        salt_hex = long_to_hex(get_random(16))
+        verifier = self.verifier(username, salt_hex)
+        small_b = get_random(128) % self.big_n
+        big_b = (self.k * verifier + pow(self.g, small_b, self.big_n)) % self.big_n
+        secret_block = base64.standard_b64encode(os.urandom(64)).decode("utf-8")
+        with self._lock:
+            self._pending[secret_block] = (username, big_a, small_b, big_b, verifier)
+        return {
+            "USER_ID_FOR_SRP": username,
+            "SALT": salt_hex,
+            "SRP_B": long_to_hex(big_b),
+            "SECRET_BLOCK": secret_block,
+        }
+
+    def verify(self, responses: Dict) -> Optional[str]:
+        """The username if the password claim is valid, else None."""
+        secret_block = responses.get("PASSWORD_CLAIM_SECRET_BLOCK", "")
+        with self._lock:
+            pending = self._pending.pop(secret_block, None)
+        if pending is None:
+            return None
+        username, big_a, small_b, big_b, verifier = pending
+        if responses.get("USERNAME") != username:
+            return None
+
+        u_value = calculate_u(big_a, big_b)
+        s_value = pow(big_a * pow(verifier, u_value, self.big_n), small_b, self.big_n)
+        hkdf = compute_hkdf(bytearray.fromhex(pad_hex(s_value)),
+                            bytearray.fromhex(pad_hex(long_to_hex(u_value))))
+        msg = (self.pool_name + username).encode("utf-8") + base64.standard_b64decode(secret_block) \
+            + responses.get("TIMESTAMP", "").encode("utf-8")
+        expected = base64.standard_b64encode(hmac.new(hkdf, msg, hashlib.sha256).digest()).decode("utf-8")
+        if not hmac.compare_digest(expected, responses.get("PASSWORD_CLAIM_SIGNATURE", "")):
+            return None
+        return username
+
+
+class MockHub:
+    """
+    The hub, storage API and Cognito on one local port:
+
+    - /attendee-portal/ -> /auth/login/cognito/start -> /oauth2/authorize -> redirect_uri
+      carrying authorization_code and state, as call_* in download.py expect
+    - POST /storage with a valid code and access token
+    - /auth/login/cognito/?code=&state= sets the hub session cookie
+    - /attendee-portal-api/... needs the cookie
+    - POST /cognito with an X-Amz-Target header is Cognito
+    """
+
+    def __init__(
+        self,
+        sessions: int = 5000,
+        favorites: int = 25,
+        latency: float = 0.0,
+        fail_rate: float = 0.0,
+        users: Optional[Dict[str, str]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.favorites = favorites
+        self.srp = SrpServer(USER_POOL_ID, users or DEFAULT_USERS)
+        self.set_catalog(make_sessions(sessions))
+        self.user_uids = {name: secrets.token_hex(16) for name in self.srp.users}
+
+        self._lock = threading.Lock()
+        self.codes: Dict[str, Dict] = {}         # authorization code -> {"state", "stored"}
+        self.access_tokens: Dict[str, str] = {}  # access token -> username
+        self.refresh_tokens: Dict[str, str] = {}
+        self.hub_sessions: Dict[str, str] = {}   # cookie -> username
+        self.requests = 0
+
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        return hub_env(self.url)
+
+    def set_catalog(self, catalog: List[Dict]) -> None:
+        for session in catalog:
+            session.pop("isFavorite", None)
+        self.catalog = catalog
+        self.catalog_body = json.dumps({"data": catalog}).encode("utf-8")
+        self.catalog_etag = '"' + hashlib.sha256(self.catalog_body).hexdigest()[:32] + '"'
+
+    def expire_sessions(self) -> None:
+        """Forget every hub session cookie, as when they time out."""
+        with self._lock:
+            self.hub_sessions.clear()
+
+    def favorites_for(self, username: str) -> List[Dict]:
+        rng = random.Random(username)
+        chosen = rng.sample(self.catalog, min(self.favorites, len(self.catalog)))
+        return [{"scheduleUid": session["scheduleUid"]} for session in chosen]
+
+    def start(self) -> "MockHub":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "MockHub":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def issue_tokens(self, username: str, with_refresh: bool = True) -> Dict:
+        access_token = make_token("access")
+        result = {
+            "AccessToken": access_token,
+            "IdToken": make_token("id"),
+            "ExpiresIn": TOKEN_LIFETIME,
+            "TokenType": "Bearer",
+        }
+        with self._lock:
+            self.access_tokens[access_token] = username
+            if with_refresh:
+                refresh_token = secrets.token_hex(32)
+                self.refresh_tokens[refresh_token] = username
+                result["RefreshToken"] = refresh_token
+        return result
+
+    def _handler(self):
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def send(self, status: int, body: bytes = b"", headers: Optional[Dict] = None) -> None:
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body and self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def send_json(self, status: int, value, headers: Optional[Dict] = None) -> None:
+                self.send(status, json.dumps(value).encode("utf-8"),
+                          {"Content-Type": "application/json", **(headers or {})})
+
+            def redirect(self, location: str, headers: Optional[Dict] = None) -> None:
+                self.send(302, b"", {"Location": location, **(headers or {})})
+
+            def read_body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            def delay(self) -> bool:
+                """Apply the latency; True if this request should fail with a 503."""
+                with hub._lock:
+                    hub.requests += 1
+                if hub.latency:
+                    time.sleep(hub.latency)
+                if hub.fail_rate and random.random() < hub.fail_rate:
+                    self.read_body()
+                    self.send(503, b"", {"Retry-After": "0"})
+                    return True
+                return False
+
+            def hub_user(self) -> Optional[str]:
+                for part in self.headers.get("Cookie", "").split(";"):
+                    name, _, value = part.strip().partition("=")
+                    if name == COOKIE_NAME:
+                        return hub.hub_sessions.get(value)
+                return None
+
+            def do_GET(self) -> None:
+                if self.delay():
+                    return
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+                if url.path == "/attendee-portal/":
+                    return self.redirect("/auth/login/cognito/start")
+                if url.path == "/auth/login/cognito/start":
+                    return self.redirect(f"{hub.url}/oauth2/authorize?response_type=code&client_id=mock")
+                if url.path == "/oauth2/authorize":
+                    code, state = secrets.token_hex(16), secrets.token_hex(8)
+                    with hub._lock:
+                        hub.codes[code] = {"state": state, "stored": False}
+                    return self.redirect(
+                        f"{hub.url}/login?client_id=mock"
+                        f"&redirect_uri={hub.url}/auth/callback?authorization_code={code}&state={state}"
+                    )
+                if url.path == "/auth/login/cognito/":
+                    with hub._lock:
+                        issued = hub.codes.pop(query.get("code", ""), None)
+                    if issued is None or not issued["stored"] or issued["state"] != query.get("state"):
+                        return self.send_json(400, {"message": "Invalid code or state"})
+                    cookie = secrets.token_hex(24)
+                    with hub._lock:
+                        hub.hub_sessions[cookie] = issued["username"]
+                    return self.redirect("/attendee-portal/", {"Set-Cookie": f"{COOKIE_NAME}={cookie}; Path=/"})
+
+                if url.path.startswith("/attendee-portal-api/"):
+                    username = self.hub_user()
+                    if username is None:
+                        return self.send_json(401, {"message": "Not logged in"})
+                    if url.path == "/attendee-portal-api/user/":
+                        return self.send_json(200, {"data": {"userUid": hub.user_uids[username]}})
+                    if url.path == "/attendee-portal-api/events/getUserReservations/":
+                        if query.get("user_uuid") != hub.user_uids[username]:
+                            return self.send_json(403, {"message": "Wrong user"})
+                        return self.send_json(200, {"data": {"followedSessions": hub.favorites_for(username)}})
+                    if url.path == "/attendee-portal-api/sessions/list/":
+                        if self.headers.get("If-None-Match") == hub.catalog_etag:
+                            return self.send(304, b"", {"ETag": hub.catalog_etag})
+                        return self.send(200, hub.catalog_body,
+                                         {"Content-Type": "application/json", "ETag": hub.catalog_etag})
+                self.send_json(404, {"message": "Not found"})
+
+            def do_POST(self) -> None:
+                if self.delay():
+                    return
+                body = self.read_body()
+                target = self.headers.get("X-Amz-Target", "")
+                if target:
+                    return self.cognito(target.rpartition(".")[2], json.loads(body or b"{}"))
+                if urlparse(self.path).path == "/storage":
+                    data = json.loads(body or b"{}")
+                    with hub._lock:
+                        issued = hub.codes.get(data.get("authorization_code"))
+                        username = hub.access_tokens.get(data.get("access_token"))
+                        if issued is None or username is None:
+                            return self.send_json(400, {"message": "Invalid code or token"})
+                        issued.update(stored=True, username=username)
+                    return self.send_json(200, {"message": "ok"})
+                self.send_json(404, {"message": "Not found"})
+
+            def cognito_error(self, kind: str, message: str) -> None:
+                self.send_json(400, {"__type": kind, "message": message},
+                               {"Content-Type": "application/x-amz-json-1.1", "x-amzn-ErrorType": kind})
+
+            def cognito(self, action: str, request: Dict) -> None:
+                headers = {"Content-Type": "application/x-amz-json-1.1"}
+                params = request.get("AuthParameters", {})
+                if action == "InitiateAuth" and request.get("AuthFlow") == "USER_SRP_AUTH":
+                    challenge = hub.srp.start(params.get("USERNAME", ""), params.get("SRP_A", "0"))
+                    if challenge is None:
+                        return self.cognito_error("UserNotFoundException", "User does not exist.")
+                    return self.send_json(200, {
+                        "ChallengeName": "PASSWORD_VERIFIER",
+                        "ChallengeParameters": challenge,
+                    }, headers)
+                if action == "InitiateAuth" and request.get("AuthFlow") == "REFRESH_TOKEN_AUTH":
+                    username = hub.refresh_tokens.get(params.get("REFRESH_TOKEN"))
+                    if username is None:
+                        return self.cognito_error("NotAuthorizedException", "Invalid Refresh Token")
+                    return self.send_json(200, {
+                        "AuthenticationResult": hub.issue_tokens(username, with_refresh=False),
+                        "ChallengeParameters": {},
+                    }, headers)
+                if action == "RespondToAuthChallenge" and request.get("ChallengeName") == "PASSWORD_VERIFIER":
+                    username = hub.srp.verify(request.get("ChallengeResponses", {}))
+                    if username is None:
+                        return self.cognito_error("NotAuthorizedException", "Incorrect username or password.")
+                    return self.send_json(200, {
+                        "AuthenticationResult": hub.issue_tokens(username),
+                        "ChallengeParameters": {},
+                    }, headers)
+                self.cognito_error("InvalidParameterException", f"Unsupported request {action}")
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--sessions", type=int, default=5000, help="Catalog size")
+    parser.add_argument("--favorites", type=int, default=25, help="Favorites per user")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--user", action="append", default=[], help="username:password (repeatable, default bench:bench-password)")
+    parser.add_argument("--print-env", action="store_true", help="Print the environment variables for download.py and exit")
+    args = parser.parse_args()
+
+    users = dict(user.split(":", 1) for user in args.user) or None
+    if args.print_env:
+        for name, value in hub_env(f"http://{args.host}:{args.port}").items():
+            print(f"export {name}={value}")
+        return
+
+    hub = MockHub(args.sessions, args.favorites, args.latency, args.fail_rate, users, args.host, args.port)
+    print(f"Mock hub with {args.sessions} sessions listening on {hub.url}")
+    try:
+        hub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Synthetic re:Invent catalogs shaped like the sessions list API response,
+for benchmarks that need more sessions than the real catalog has.
+"""
+import random
+import uuid
+from typing import Dict, List
+
+TRACKS = [
+    "Analytics", "Architecture", "Compute", "Containers", "Databases", "Developer Productivity",
+    "End-User Computing", "Generative AI", "Hybrid Cloud", "IoT", "Machine Learning",
+    "Management & Governance", "Migration", "Networking", "Security", "Serverless", "Storage",
+]
+TRACK_CODES = ["ANT", "ARC", "CMP", "CON", "DAT", "DOP", "EUC", "AIM", "HYB", "IOT", "MLA", "COP", "ENT", "NET", "SEC", "SVS", "STG"]
+SESSION_TYPES = ["Breakout Session", "Chalk Talk", "Workshop", "Builders' Session", "Code talk", "Lightning talk"]
+TYPE_SUFFIXES = ["", "-R", "-R1", "-R2"]
+VENUES = ["Venetian", "Wynn", "Encore", "Caesars Forum", "MGM Grand", "Mandalay Bay"]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+AREAS = ["Industry", "Role", "Topic", "Services", "Area of interest"]
+WORDS = (
+    "scale build resilient serverless data lake streaming secure observability cost modern "
+    "architecture patterns migrate workloads generative models inference training analytics "
+    "real-time event-driven containers kubernetes edge networking storage performance"
+).split()
+
+# Monday 27 November 2023, 08:00 America/Los_Angeles
+CONFERENCE_START = 1701100800
+
+
+def make_descriptions(rng: random.Random, count: int = 500) -> List[str]:
+    # Sessions draw from a shared pool so very large catalogs stay cheap to generate
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randrange(60, 180))) for _ in range(count)]
+
+
+def make_session(rng: random.Random, index: int, descriptions: List[str]) -> Dict:
+    track = rng.randrange(len(TRACKS))
+    day = rng.randrange(len(DAYS))
+    start = CONFERENCE_START + day * 86400 + rng.randrange(0, 10 * 60, 30) * 60
+    code = f"{TRACK_CODES[track]}{rng.choice('234')}{index % 100:02d}{rng.choice(TYPE_SUFFIXES)}"
+    tags = [
+        {"parentTagName": "Venue", "tagName": rng.choice(VENUES)},
+        {"parentTagName": "Day", "tagName": DAYS[day]},
+    ] + [
+        {"parentTagName": rng.choice(AREAS), "tagName": rng.choice(WORDS).title()}
+        for _ in range(rng.randrange(2, 8))
+    ]
+    return {
+        "scheduleUid": str(uuid.UUID(int=rng.getrandbits(128))),
+        "sessionUid": str(uuid.UUID(int=rng.getrandbits(128))),
+        "thirdPartyID": code,
+        "title": " ".join(rng.choice(WORDS) for _ in range(rng.randrange(4, 10))).capitalize(),
+        "description": rng.choice(descriptions),
+        "sessionType": rng.choice(SESSION_TYPES),
+        "trackName": TRACKS[track],
+        "startDateTime": start,
+        "endDateTime": start + rng.choice([30, 60, 120]) * 60,
+        "tags": tags,
+        "isFavorite": rng.random() < 0.02,
+    }
+
+
+def make_sessions(count: int, seed: int = 2023) -> List[Dict]:
+    rng = random.Random(seed)
+    descriptions = make_descriptions(rng)
+    return [make_session(rng, i, descriptions) for i in range(count)]
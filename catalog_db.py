@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import pytz
+
+LOCAL_TIMEZONE = pytz.timezone("America/Los_Angeles")
+
+SCHEMA = """
+CREATE TABLE sessions (
+    position INTEGER PRIMARY KEY,
+    scheduleUid TEXT NOT NULL,
+    thirdPartyID TEXT,
+    title TEXT,
+    sessionType TEXT COLLATE NOCASE,
+    trackName TEXT COLLATE NOCASE,
+    level INTEGER,
+    venue TEXT COLLATE NOCASE,
+    day TEXT COLLATE NOCASE,
+    startDateTime INTEGER,
+    endDateTime INTEGER,
+    startMinute INTEGER,
+    endMinute INTEGER,
+    data TEXT NOT NULL
+);
+CREATE TABLE tag_names (
+    id INTEGER PRIMARY KEY,
+    parentTagName TEXT COLLATE NOCASE,
+    tagName TEXT COLLATE NOCASE
+);
+CREATE TABLE tags (
+    position INTEGER NOT NULL REFERENCES sessions (position),
+    tag INTEGER NOT NULL REFERENCES tag_names (id)
+);
+"""
+
+# Built after the bulk insert, which is much faster than maintaining them row by row
+INDEXES = """
+CREATE UNIQUE INDEX idx_sessions_scheduleUid ON sessions (scheduleUid);
+CREATE INDEX idx_sessions_thirdPartyID ON sessions (thirdPartyID);
+CREATE INDEX idx_sessions_trackName ON sessions (trackName);
+CREATE INDEX idx_sessions_sessionType ON sessions (sessionType);
+CREATE INDEX idx_sessions_level ON sessions (level);
+CREATE INDEX idx_sessions_venue_day ON sessions (venue, day, startMinute);
+CREATE INDEX idx_sessions_day ON sessions (day, startMinute);
+CREATE INDEX idx_sessions_startDateTime ON sessions (startDateTime, endDateTime);
+CREATE INDEX idx_tag_names_tagName ON tag_names (tagName);
+CREATE INDEX idx_tags_tag ON tags (tag);
+CREATE INDEX idx_tags_position ON tags (position);
+"""
+
+
+def session_level(third_party_id: str) -> int:
+    """Level of a session from its ID, e.g. ARC301-R -> 300, or 0 if unknown."""
+    if len(third_party_id) >= 4 and third_party_id[3].isdigit():
+        return int(third_party_id[3]) * 100
+    return 0
+
+
+def local_minute(timestamp) -> Optional[int]:
+    """Minutes since local midnight in Las Vegas for an epoch timestamp."""
+    if timestamp in ("", None):
+        return None
+    local = datetime.fromtimestamp(timestamp, timezone.utc).astimezone(LOCAL_TIMEZONE)
+    return local.hour * 60 + local.minute
+
+
+def parse_time_of_day(value: str) -> int:
+    """
+    Parse "13:00", "1pm", "1:30 pm" or "13" into minutes since midnight.
+    """
+    match = re.fullmatch(r"\s*(\d{1,2})(?::(\d{2}))?\s*([ap]\.?m\.?)?\s*", value, re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"Cannot parse time of day: {value!r}")
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"Cannot parse time of day: {value!r}")
+        hour = hour % 12 + (12 if meridiem.lower().startswith("p") else 0)
+    if hour > 23 or minute > 59:
+        raise ValueError(f"Cannot parse time of day: {value!r}")
+    return hour * 60 + minute
+
+
+def _tag_value(session: Dict, parent: str) -> str:
+    value = ""
+    for tag in session.get("tags", []):
+        if tag["parentTagName"] == parent:
+            value = tag["tagName"]
+    return value
+
+
+def _plain_tags(session: Dict) -> bool:
+    """Whether the session's tags are all {parentTagName, tagName}, i.e. fully held by the tags table."""
+    return all(tag.keys() == {"parentTagName", "tagName"} for tag in session.get("tags", []))
+
+
+def write_database(path: str, sessions: Iterable[Dict]) -> int:
+    """
+    Write `sessions` to a new SQLite database at `path`, replacing it atomically.
+    Returns the number of sessions written.
+
+    Each distinct tag is stored once in tag_names and referenced by id from tags.
+    Plain tags are left out of the session's JSON (stored as "tags": null) and
+    rebuilt from the tags table by read_sessions.
+    """
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        session_rows = []
+        tag_rows = []
+        tag_ids: Dict[tuple, int] = {}
+        count = 0
+        for position, session in enumerate(sessions):
+            data = session
+            if session.get("tags") and _plain_tags(session):
+                data = {**session, "tags": None}
+            session_rows.append((
+                position,
+                session["scheduleUid"],
+                session.get("thirdPartyID"),
+                session.get("title"),
+                session.get("sessionType"),
+                session.get("trackName"),
+                session_level(session.get("thirdPartyID", "")),
+                _tag_value(session, "Venue"),
+                _tag_value(session, "Day"),
+                session.get("startDateTime") or None,
+                session.get("endDateTime") or None,
+                local_minute(session.get("startDateTime")),
+                local_minute(session.get("endDateTime")),
+                json.dumps(data, separators=(",", ":")),
+            ))
+            for tag in session.get("tags", []):
+                key = (tag["parentTagName"], tag["tagName"])
+                tag_id = tag_ids.get(key)
+                if tag_id is None:
+                    tag_id = tag_ids[key] = len(tag_ids)
+                    conn.execute("INSERT INTO tag_names VALUES (?, ?, ?)", (tag_id, *key))
+                tag_rows.append((position, tag_id))
+            count += 1
+            # Flush in batches so memory stays bounded when `sessions` is a stream
+            if len(session_rows) >= 1000:
+                _insert(conn, session_rows, tag_rows)
+        _insert(conn, session_rows, tag_rows)
+        conn.executescript(INDEXES)
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return count
+
+
+def _insert(conn: sqlite3.Connection, session_rows: List, tag_rows: List) -> None:
+    conn.executemany(
+        "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", session_rows
+    )
+    conn.executemany("INSERT INTO tags VALUES (?, ?)", tag_rows)
+    session_rows.clear()
+    tag_rows.clear()
+
+
+def read_sessions(path: str) -> List[Dict]:
+    conn = sqlite3.connect(path)
+    try:
+        sessions = [
+            json.loads(data)
+            for (data,) in conn.execute("SELECT data FROM sessions ORDER BY position")
+        ]
+        if any(session.get("tags", ()) is None for session in sessions):
+            # Every distinct tag name is one string object shared by the sessions using it
+            names = {
+                tag_id: (parent, name)
+                for tag_id, parent, name in conn.execute("SELECT id, parentTagName, tagName FROM tag_names")
+            }
+            tags: Dict[int, List[Dict]] = {}
+            for position, tag_id in conn.execute("SELECT position, tag FROM tags ORDER BY rowid"):
+                parent, name = names[tag_id]
+                tags.setdefault(position, []).append({"parentTagName": parent, "tagName": name})
+            for position, session in enumerate(sessions):
+                if session.get("tags", ()) is None:
+                    session["tags"] = tags.get(position, [])
+        return sessions
+    finally:
+        conn.close()
+
+
+def find_sessions(
+    conn: sqlite3.Connection,
+    venue: Optional[str] = None,
+    day: Optional[str] = None,
+    level: Optional[int] = None,
+    track: Optional[str] = None,
+    session_type: Optional[str] = None,
+    starts_after: Optional[int] = None,
+    ends_before: Optional[int] = None,
+    tags: Iterable[str] = (),
+    title: Optional[str] = None,
+) -> List[sqlite3.Row]:
+    """
+    Query the catalog. Text filters match case-insensitively on a prefix
+    (venue="venetian", day="tue"); times are minutes since local midnight.
+    Each tag filter must match the name of one of the session's tags.
+    """
+    clauses = []
+    params: List = []
+    for column, value in (
+        ("venue", venue),
+        ("day", day),
+        ("trackName", track),
+        ("sessionType", session_type),
+    ):
+        if value:
+            clauses.append(f"{column} LIKE ?")
+            params.append(value + "%")
+    if level is not None:
+        clauses.append("level = ?")
+        params.append(level)
+    if starts_after is not None:
+        clauses.append("startMinute >= ?")
+        params.append(starts_after)
+    if ends_before is not None:
+        clauses.append("endMinute <= ?")
+        params.append(ends_before)
+    if title:
+        clauses.append("title LIKE ?")
+        params.append("%" + title + "%")
+    for tag in tags:
+        clauses.append(
+            "position IN (SELECT position FROM tags WHERE tag IN (SELECT id FROM tag_names WHERE tagName LIKE ?))"
+        )
+        params.append(tag + "%")
+
+    where = " AND ".join(clauses) if clauses else "1"
+    conn.row_factory = sqlite3.Row
+    return conn.execute(
+        "SELECT thirdPartyID, title, sessionType, trackName, level, venue, day, "
+        "startDateTime, endDateTime, startMinute, endMinute, scheduleUid "
+        f"FROM sessions WHERE {where} ORDER BY startDateTime, thirdPartyID",
+        params,
+    ).fetchall()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+import json
+import os
+from typing import Dict, Iterable, List
+
+import catalog_db
+from interning import StringTable
+from json_stream import write_json_array
+
+
+class JsonBackend:
+    """Pretty-printed JSON array, the original sessions.json format."""
+
+    name = "json"
+    extensions = (".json",)
+    indent = 4
+
+    def save(self, path: str, sessions: Iterable[Dict]) -> int:
+        return write_json_array(path, sessions, indent=self.indent)
+
+    def load(self, path: str) -> List[Dict]:
+        with open(path, "r") as f:
+            return json.load(f)
+
+
+class CompactJsonBackend(JsonBackend):
+    """JSON array without indentation or spaces after separators."""
+
+    name = "compact-json"
+    extensions = (".min.json",)
+    indent = None
+
+
+class InternedJsonBackend:
+    """
+    Compact JSON with the values sessions repeat dictionary-encoded: sessionType and
+    trackName are indexes into "strings", and plain {parentTagName, tagName} tags are
+    indexes into "tags", a list of [parent, name] pairs of indexes into "strings".
+    Loading gives back the usual session dicts, sharing one string object per value.
+    """
+
+    name = "interned-json"
+    extensions = (".interned.json",)
+    interned_keys = ("sessionType", "trackName")
+
+    def save(self, path: str, sessions: Iterable[Dict]) -> int:
+        strings = StringTable()
+        tag_codes: Dict[tuple, int] = {}
+        tag_pairs: List[List[int]] = []
+
+        def encode_tag(tag: Dict):
+            if tag.keys() != {"parentTagName", "tagName"}:
+                return tag
+            key = (tag["parentTagName"], tag["tagName"])
+            code = tag_codes.get(key)
+            if code is None:
+                code = tag_codes[key] = len(tag_pairs)
+                tag_pairs.append([strings.intern(key[0]), strings.intern(key[1])])
+            return code
+
+        count = 0
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write('{"sessions":[')
+            for session in sessions:
+                encoded = dict(session)
+                for key in self.interned_keys:
+                    if isinstance(encoded.get(key), str):
+                        encoded[key] = strings.intern(encoded[key])
+                if "tags" in encoded:
+                    encoded["tags"] = [encode_tag(tag) for tag in encoded["tags"]]
+                if count:
+                    f.write(",")
+                f.write(json.dumps(encoded, separators=(",", ":")))
+                count += 1
+            f.write('],"strings":' + json.dumps(strings.values, separators=(",", ":")))
+            f.write(',"tags":' + json.dumps(tag_pairs, separators=(",", ":")) + "}")
+        os.replace(tmp_path, path)
+        return count
+
+    def load(self, path: str) -> List[Dict]:
+        with open(path, "r") as f:
+            data = json.load(f)
+        strings = data["strings"]
+        tags = [(strings[parent], strings[name]) for parent, name in data["tags"]]
+        sessions = data["sessions"]
+        for session in sessions:
+            for key in self.interned_keys:
+                value = session.get(key)
+                if isinstance(value, int) and not isinstance(value, bool):
+                    session[key] = strings[value]
+            if "tags" in session:
+                session["tags"] = [
+                    {"parentTagName": tags[tag][0], "tagName": tags[tag][1]} if isinstance(tag, int) else tag
+                    for tag in session["tags"]
+                ]
+        return sessions
+
+
+class MsgpackBackend:
+    """
+    Stream of msgpack-encoded sessions, one object after another.
+    Needs the optional `msgpack` package.
+    """
+
+    name = "msgpack"
+    extensions = (".msgpack", ".mpk")
+
+    @staticmethod
+    def _msgpack():
+        try:
+            import msgpack
+        except ImportError:
+            raise RuntimeError(
+                "The msgpack storage format needs the msgpack package (pip install msgpack)"
+            ) from None
+        return msgpack
+
+    def save(self, path: str, sessions: Iterable[Dict]) -> int:
+        msgpack = self._msgpack()
+        packer = msgpack.Packer()
+        count = 0
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for session in sessions:
+                f.write(packer.pack(session))
+                count += 1
+        os.replace(tmp_path, path)
+        return count
+
+    def load(self, path: str) -> List[Dict]:
+        msgpack = self._msgpack()
+        with open(path, "rb") as f:
+            return list(msgpack.Unpacker(f, raw=False))
+
+
+class SqliteBackend:
+    """
+    SQLite database with one row per session (see catalog_db). The full session
+    is kept as JSON, with the fields used for querying in indexed columns and
+    the tags in their own table.
+    """
+
+    name = "sqlite"
+    extensions = (".sqlite", ".sqlite3", ".db")
+
+    def save(self, path: str, sessions: Iterable[Dict]) -> int:
+        return catalog_db.write_database(path, sessions)
+
+    def load(self, path: str) -> List[Dict]:
+        return catalog_db.read_sessions(path)
+
+
+BACKENDS = [CompactJsonBackend(), InternedJsonBackend(), JsonBackend(), MsgpackBackend(), SqliteBackend()]
+
+
+def backend_for(path: str):
+    """
+    Pick the storage backend from the file name, e.g. sessions.json,
+    sessions.min.json, sessions.msgpack or sessions.sqlite.
+    """
+    lower = path.lower()
+    # Longest extension first so .min.json wins over .json
+    for backend in sorted(BACKENDS, key=lambda b: -max(len(e) for e in b.extensions)):
+        if lower.endswith(backend.extensions):
+            return backend
+    raise ValueError(f"Unknown catalog storage format for {path}")
+
+
+def save_sessions(path: str, sessions: Iterable[Dict]) -> int:
+    return backend_for(path).save(path, sessions)
+
+
+def load_sessions(path: str) -> List[Dict]:
+    return backend_for(path).load(path)
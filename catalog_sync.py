@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+
+def session_hash(session: Dict) -> str:
+    encoded = json.dumps(session, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ChangeSet:
+    def __init__(self):
+        self.added: List[Dict] = []
+        self.modified: List[Dict] = []
+        self.removed: List[str] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.modified or self.removed)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.added)} added, {len(self.modified)} modified, "
+            f"{len(self.removed)} removed"
+        )
+
+
+class CatalogStore:
+    """
+    Local catalog store keyed by scheduleUid.
+
+    The directory holds three files:
+      - index.json:    change sequence number and the content hash of every session
+      - changes.jsonl: append-only log, one line per sync that changed something
+      - snapshot.json: every session as of the last compaction
+
+    Consumers read changes.jsonl from the last `seq` they have seen. When the log
+    is compacted into snapshot.json it is truncated, so a consumer whose `seq` is
+    older than the snapshot's must reload the snapshot.
+    """
+
+    def __init__(self, directory: str, compact_every: int = 50):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.index_path = os.path.join(directory, "index.json")
+        self.changes_path = os.path.join(directory, "changes.jsonl")
+        self.snapshot_path = os.path.join(directory, "snapshot.json")
+
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+        else:
+            index = {"seq": 0, "log_entries": 0, "hashes": {}}
+        self.seq: int = index["seq"]
+        self.log_entries: int = index["log_entries"]
+        self.hashes: Dict[str, str] = index["hashes"]
+
+    def diff(self, sessions: Iterable[Dict]) -> ChangeSet:
+        changes = ChangeSet()
+        seen = set()
+        for session in sessions:
+            uid = session["scheduleUid"]
+            seen.add(uid)
+            old_hash = self.hashes.get(uid)
+            if old_hash is None:
+                changes.added.append(session)
+            elif old_hash != session_hash(session):
+                changes.modified.append(session)
+        changes.removed = [uid for uid in self.hashes if uid not in seen]
+        return changes
+
+    def sync(self, sessions: Iterable[Dict]) -> ChangeSet:
+        """
+        Compare `sessions` with the store, record the differences and return them.
+        """
+        changes = self.diff(sessions)
+        self.record(changes)
+        return changes
+
+    def record(self, changes: ChangeSet) -> None:
+        """
+        Record `changes`, as returned by diff(), in the log and the index.
+        """
+        if not changes:
+            return
+
+        self.seq += 1
+        entry = {
+            "seq": self.seq,
+            "time": datetime.now(timezone.utc).isoformat(),
+            "added": changes.added,
+            "modified": changes.modified,
+            "removed": changes.removed,
+        }
+        with open(self.changes_path, "a") as f:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self.log_entries += 1
+
+        for session in changes.added + changes.modified:
+            self.hashes[session["scheduleUid"]] = session_hash(session)
+        for uid in changes.removed:
+            del self.hashes[uid]
+
+        if self.log_entries >= self.compact_every:
+            self.compact()
+        else:
+            self._write_index()
+
+    def sessions(self) -> Dict[str, Dict]:
+        """
+        Rebuild the current catalog from the snapshot plus the change log.
+        """
+        current: Dict[str, Dict] = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r") as f:
+                current = json.load(f)["sessions"]
+        if os.path.exists(self.changes_path):
+            with open(self.changes_path, "r") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    for session in entry["added"] + entry["modified"]:
+                        current[session["scheduleUid"]] = session
+                    for uid in entry["removed"]:
+                        current.pop(uid, None)
+        return current
+
+    def compact(self) -> None:
+        logger.info(f"Compacting catalog store at change {self.seq}")
+        current = self.sessions()
+        self._atomic_write(
+            self.snapshot_path,
+            json.dumps({"seq": self.seq, "sessions": current}, separators=(",", ":")),
+        )
+        open(self.changes_path, "w").close()
+        self.log_entries = 0
+        self._write_index()
+
+    def _write_index(self) -> None:
+        index = {"seq": self.seq, "log_entries": self.log_entries, "hashes": self.hashes}
+        self._atomic_write(self.index_path, json.dumps(index, separators=(",", ":")))
+
+    @staticmethod
+    def _atomic_write(path: str, data: str) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
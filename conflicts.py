@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Schedule conflict detection over the sessions someone selected or marked as a favourite.
+
+Sessions are swept in start-time order while an "active" heap holds the ones that
+can still clash with what comes next: a session leaves the heap once even the
+longest walk out of its venue would be over before the current session starts.
+Only sessions in the heap are compared, so the work grows with the number of
+sessions plus the number of conflicts rather than with every pair.
+"""
+import heapq
+import json
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from normalize import MISSING, SessionTable, to_excel_date
+
+
+class Interval(NamedTuple):
+    owner: str
+    third_party_id: str
+    title: str
+    venue: str
+    start: int  # local wall-clock seconds, as in SessionTable
+    end: int
+
+
+class Conflict(NamedTuple):
+    owner: str
+    first: Interval
+    second: Interval
+    kind: str         # "overlap" or "travel"
+    shortfall: int    # seconds missing to get from the first session to the second
+
+
+class TravelTimes:
+    """
+    Walking time between venues, from {"Venetian": {"Wynn": 20, ...}, ...} in minutes.
+    A time given for one direction is used for the other as well unless that is given
+    too; pairs that are not listed take `default` minutes, the same venue takes 0.
+    """
+
+    def __init__(self, minutes: Optional[Dict[str, Dict[str, float]]] = None, default: float = 0):
+        self.default = int(default * 60)
+        self.seconds: Dict[str, Dict[str, int]] = defaultdict(dict)
+        for origin, targets in (minutes or {}).items():
+            for target, value in targets.items():
+                self.seconds[origin][target] = int(value * 60)
+                self.seconds[target].setdefault(origin, int(value * 60))
+        self._max_from: Dict[str, int] = {}
+
+    @classmethod
+    def load(cls, path: str, default: float = 0) -> "TravelTimes":
+        with open(path, "r") as f:
+            return cls(json.load(f), default)
+
+    def between(self, origin: str, target: str) -> int:
+        if origin == target:
+            return 0
+        return self.seconds.get(origin, {}).get(target, self.default)
+
+    def max_from(self, origin: str) -> int:
+        """Longest travel time out of `origin` to anywhere."""
+        value = self._max_from.get(origin)
+        if value is None:
+            value = max([self.default, *self.seconds.get(origin, {}).values()])
+            self._max_from[origin] = value
+        return value
+
+
+def is_marked(value) -> bool:
+    return not (value is None or (isinstance(value, str) and value.strip() == ""))
+
+
+def chosen_intervals(table: SessionTable, owner: str = "") -> List[Interval]:
+    """Timed sessions of `table` whose selected or Favourite column is filled in."""
+    return [
+        Interval(owner, table.third_party_id[i], table.title[i], table.venue[i],
+                 table.start_time[i], table.end_time[i])
+        for i in range(len(table))
+        if (is_marked(table.selected[i]) or is_marked(table.favourite[i]))
+        and table.start_time[i] != MISSING and table.end_time[i] != MISSING
+    ]
+
+
+def find_conflicts(intervals: Iterable[Interval], travel: Optional[TravelTimes] = None) -> List[Conflict]:
+    """
+    Return every pair of one owner's sessions that overlap, or that leave less time
+    between them than it takes to walk from the first venue to the second.
+    """
+    travel = travel or TravelTimes()
+    by_owner: Dict[str, List[Interval]] = defaultdict(list)
+    for interval in intervals:
+        by_owner[interval.owner].append(interval)
+
+    conflicts: List[Conflict] = []
+    for owner, owned in by_owner.items():
+        owned.sort(key=lambda iv: (iv.start, iv.end))
+        # (time after which this session cannot clash with a later one, tie-breaker, session)
+        active: List = []
+        for n, current in enumerate(owned):
+            while active and active[0][0] <= current.start:
+                heapq.heappop(active)
+            for _, _, earlier in active:
+                needed = earlier.end + travel.between(earlier.venue, current.venue)
+                if current.start < needed:
+                    kind = "overlap" if current.start < earlier.end else "travel"
+                    conflicts.append(Conflict(owner, earlier, current, kind, needed - current.start))
+            heapq.heappush(active, (current.end + travel.max_from(current.venue), n, current))
+
+    conflicts.sort(key=lambda c: (c.owner, c.first.start, c.second.start))
+    return conflicts
+
+
+CONFLICT_COLUMNS = [
+    ("Owner", 14),
+    ("Kind", 9),
+    ("ShortMinutes", 8),
+    ("ID", 12),
+    ("Title", 60),
+    ("Venue", 14),
+    ("StartTime", 18),
+    ("EndTime", 18),
+    ("ConflictID", 12),
+    ("ConflictTitle", 60),
+    ("ConflictVenue", 14),
+    ("ConflictStartTime", 18),
+    ("ConflictEndTime", 18),
+]
+
+
+def conflict_rows(conflicts: Iterable[Conflict]):
+    """Conflicts as tuples in CONFLICT_COLUMNS order."""
+    for c in conflicts:
+        yield (
+            c.owner, c.kind, round(c.shortfall / 60),
+            c.first.third_party_id, c.first.title, c.first.venue,
+            to_excel_date(c.first.start), to_excel_date(c.first.end),
+            c.second.third_party_id, c.second.title, c.second.venue,
+            to_excel_date(c.second.start), to_excel_date(c.second.end),
+        )
+
+
+def write_conflicts_json(path: str, conflicts: Iterable[Conflict]) -> None:
+    names = [name for name, _ in CONFLICT_COLUMNS]
+    with open(path, "w") as f:
+        json.dump([dict(zip(names, row)) for row in conflict_rows(conflicts)], f, indent=4)
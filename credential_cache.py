@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+from requests.cookies import RequestsCookieJar
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "reinvent-catalog"
+)
+KDF_ITERATIONS = 200_000
+SALT_BYTES = 16
+
+logger = logging.getLogger(__name__)
+
+
+def jwt_expiry(token: str) -> Optional[int]:
+    """
+    Return the `exp` claim of a JWT (seconds since epoch) without verifying it,
+    or None if the token cannot be decoded.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return int(claims["exp"])
+    except (IndexError, ValueError, KeyError, TypeError):
+        return None
+
+
+def token_expired(token: Optional[str], leeway: int = 60) -> bool:
+    if not token:
+        return True
+    exp = jwt_expiry(token)
+    return exp is None or exp - leeway <= time.time()
+
+
+def cookies_to_list(cookies: RequestsCookieJar):
+    return [
+        {
+            "name": c.name,
+            "value": c.value,
+            "domain": c.domain,
+            "path": c.path,
+            "expires": c.expires,
+            "secure": c.secure,
+        }
+        for c in cookies
+    ]
+
+
+def cookies_from_list(items) -> RequestsCookieJar:
+    jar = RequestsCookieJar()
+    now = time.time()
+    for c in items:
+        if c["expires"] is not None and c["expires"] <= now:
+            continue
+        jar.set(
+            c["name"],
+            c["value"],
+            domain=c["domain"],
+            path=c["path"],
+            expires=c["expires"],
+            secure=c["secure"],
+        )
+    return jar
+
+
+class CredentialCache:
+    """
+    Encrypted on-disk cache of the hub cookie jar and Cognito tokens for one user.
+
+    The file is keyed by a hash of the username and encrypted with a key derived
+    from the password, so a cache written with an old password is simply a miss.
+    """
+
+    def __init__(self, username: str, password: str, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.username = username
+        self.password = password
+        self.cache_dir = cache_dir
+        name = hashlib.sha256(username.encode("utf-8")).hexdigest()
+        self.path = os.path.join(cache_dir, f"{name}.bin")
+
+    def _fernet(self, salt: bytes) -> Fernet:
+        key = hashlib.pbkdf2_hmac(
+            "sha256", self.password.encode("utf-8"), salt, KDF_ITERATIONS
+        )
+        return Fernet(base64.urlsafe_b64encode(key))
+
+    def load(self) -> Optional[Dict]:
+        """
+        Return {"cookies": RequestsCookieJar, "tokens": dict} or None on a miss.
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            blob = f.read()
+        salt, token = blob[:SALT_BYTES], blob[SALT_BYTES:]
+        try:
+            data = json.loads(self._fernet(salt).decrypt(token))
+        except (InvalidToken, ValueError):
+            logger.info("Credential cache could not be decrypted, ignoring it")
+            return None
+        if data.get("username") != self.username:
+            return None
+        return {
+            "cookies": cookies_from_list(data["cookies"]),
+            "tokens": data["tokens"],
+        }
+
+    def save(self, cookies: RequestsCookieJar, tokens: Dict) -> None:
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        data = {
+            "username": self.username,
+            "cookies": cookies_to_list(cookies),
+            "tokens": tokens,
+        }
+        salt = os.urandom(SALT_BYTES)
+        blob = salt + self._fernet(salt).encrypt(json.dumps(data).encode("utf-8"))
+        tmp_path = self.path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
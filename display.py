@@ -1,119 +1,91 @@
 #!/usr/bin/env python3
 
 import argparse
+import hashlib
 import json
 import xlsxwriter
 import openpyxl
 import os
 
-from datetime import datetime, timezone
-import pytz
+from catalog_storage import load_sessions
+from conflicts import CONFLICT_COLUMNS, TravelTimes, chosen_intervals, conflict_rows, find_conflicts, write_conflicts_json
+from normalize import normalize_sessions
+from sheet_export import GROUPINGS, export_workbook, update_workbook
+import tracing
 
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Read Favourite column from one XLSX file and add values to the generated XLSX file by a common column (ID).  It'll also show which catalog items are new and any changes to AWS Favorites.  Favorites that no longer exist will be logged to the console.")
     parser.add_argument("source_file", nargs='?', default="", help="Path to the source XLSX file (optional)")
+    parser.add_argument("--sessions", default="sessions.json", help="Catalog written by download.py (.json, .min.json, .msgpack or .sqlite)")
+    parser.add_argument("--split", type=parse_groupings, default=[], help=f"Also add a worksheet per group, e.g. --split track,day (any of: {', '.join(GROUPINGS)})")
+    parser.add_argument("--workers", type=int, default=None, help="Processes used to render worksheets with --split (default: one per CPU)")
+    parser.add_argument("--conflicts", action="store_true", help="Check the selected and Favourite sessions for clashes, adding a Conflicts sheet and writing --conflicts-json")
+    parser.add_argument("--conflicts-json", default="conflicts.json", help="Where --conflicts writes its JSON report (default: conflicts.json)")
+    parser.add_argument("--travel-times", help='JSON file of walking minutes between venues for --conflicts, e.g. {"Venetian": {"Wynn": 20}}')
+    parser.add_argument("--default-travel", type=float, default=0, help="Walking minutes assumed between venues missing from --travel-times (default: 0)")
+    parser.add_argument("--incremental", action="store_true", help="Update the existing reinvent.xlsx in place, re-rendering only the sessions that changed (keeps a row map in reinvent.xlsx.row-map.json)")
+    parser.add_argument("--trace-file", help="Write a timing trace of each stage in the Chrome trace format (chrome://tracing, ui.perfetto.dev)")
+    parser.add_argument("--metrics-file", help="Write per-stage durations and peak memory in the Prometheus text format")
     return parser.parse_args()
 
 
-def to_excel_date( d ):
-    if d != None:
-        return d.strftime('%x %X')
-    else:
-        return None
+def parse_groupings(value: str):
+    groupings = [g.strip().lower() for g in value.split(",") if g.strip()]
+    unknown = [g for g in groupings if g not in GROUPINGS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown grouping {', '.join(unknown)} (choose from {', '.join(GROUPINGS)})")
+    return groupings
 
 
-def add_item( dfs, type, session ):
-
-    category = dfs.get(type, None)
-    if category is None:
-        category = []
-        dfs[type] = category
-
-    item = {}
-    item["selected"] = session['selected']
-    item["Favourite"] = session['favourite']
-    item["FavoriteAWS"] = session['isFavorite']
-    item["IsNew"] = session['isNew']
-    item["ID"] = session['thirdPartyID']
-    item["Title"] = session['title']
-    item["SessionLevel"] = session['sessionLevel']
-    item["Description"] = session['description']
-    item["Type"] = session['sessionType']
-    item["TrackName"] = session['trackName']
-    item["Venue"] = session['venue']
-    item["Day"] = session['day']
-    item["StartTime"] = to_excel_date(session['startTime'])
-    item["EndTime"] = to_excel_date(session['endTime'])
-    item["scheduleUid"] = session['scheduleUid']
-    item["sessionUid"] = session['sessionUid']
-    
-    simple_tag_name = ""
-    for t in session['tags']:
-        simple_tag_name = simple_tag_name + t['parentTagName'].replace(" ", "_").lower() + ": " + t['tagName'] + ", "
-    item["Tags"] = simple_tag_name
-    
-    category.append(item)
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-    
-def parse_sessions(sessions, favourites, is_selected_data):
-    items = {}
-    print( f"There are currently {len(sessions)} sessions" )
 
-    # Display the sessionType, trackName, thirdPartyID, title, and description for each session
-    for session in sessions:
+def merge_cache_path(path: str) -> str:
+    return path + ".merge-cache.json"
 
-        type = session['sessionType']
-        
-        # Update Favourites
-        dest_id = session['thirdPartyID'].split("-")[0]
-        session["favourite"] = favourites[dest_id] if dest_id in favourites else ""
-
-        # Update selected
-        dest_id = session['thirdPartyID']
-        session["selected"] = is_selected_data[dest_id] if dest_id in is_selected_data else ""
-
-        # Update IsNew
-        session["isNew"] = False if dest_id in is_selected_data else True
-
-        # Clean up date/times
-        startTime = session['startDateTime']
-        endTime = session['endDateTime']
-        if startTime != "":
-            startTime = datetime.fromtimestamp(startTime, timezone.utc).astimezone(pytz.timezone('America/Los_Angeles'))
-        else:
-            startTime = None
-        if endTime != "":
-            endTime = datetime.fromtimestamp(endTime, timezone.utc).astimezone(pytz.timezone('America/Los_Angeles'))
-        else:
-            endTime = None
 
-        session["startTime"] = startTime
-        session["endTime"] = endTime
-
-        # Extract session level
-        if len(session['thirdPartyID']) >= 4:
-            session_level = int(session['thirdPartyID'][3])
-        else:
-            session_level = 0
-        session["sessionLevel"] = session_level
-
-        # Get venue and date from tags
-        # each tag has a parentTagName of either Venue or Day
-        # and we want the tagName
-        venue = ""
-        day = ""
-        for tag in session['tags']:
-            if tag['parentTagName'] == "Venue":
-                venue = tag['tagName']
-            if tag['parentTagName'] == "Day":
-                day = tag['tagName']
-
-        session["venue"] = venue
-        session["day"] = day
-
-        add_item( items, "ALL", session )
-    return items
+def load_merge_cache(path: str):
+    """
+    Return the favourite/selected maps cached for the workbook at `path`, or None.
+    A matching mtime and size is trusted; otherwise the file hash decides.
+    """
+    cache_path = merge_cache_path(path)
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, "r") as f:
+        cache = json.load(f)
+
+    stat = os.stat(path)
+    if cache["mtime"] != stat.st_mtime or cache["size"] != stat.st_size:
+        if cache["sha256"] != file_sha256(path):
+            return None
+        # Same content, just touched: remember the new mtime
+        save_merge_cache(path, cache["favourites"], cache["selected"], cache["sha256"])
+    return cache["favourites"], cache["selected"]
+
+
+def save_merge_cache(path: str, favourites_data, is_selected_data, sha256=None):
+    stat = os.stat(path)
+    cache = {
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "sha256": sha256 or file_sha256(path),
+        "favourites": favourites_data,
+        "selected": is_selected_data,
+    }
+    try:
+        data = json.dumps(cache)
+    except TypeError:
+        # e.g. a date typed into the Favourite column; just don't cache this workbook
+        return
+    with open(merge_cache_path(path), "w") as f:
+        f.write(data)
 
 
 def read_excel_source(path: str):
@@ -121,12 +93,21 @@ def read_excel_source(path: str):
     is_selected_data = {}
     
     if os.path.exists(path):
-        source_workbook = openpyxl.load_workbook(path)
+        cached = load_merge_cache(path)
+        if cached is not None:
+            return cached
+
+        # Read-only mode streams the sheet XML without building styles or cell objects
+        source_workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
         source_sheet = source_workbook['ALL']
+        source_sheet.reset_dimensions()
         
-        for row in source_sheet.iter_rows(min_row=2, values_only=True):  # Assuming headers are in row 1
+        # Only the selected (0), Favourite (1) and ID (4) columns are needed
+        for row in source_sheet.iter_rows(min_row=2, max_col=5, values_only=True):  # Assuming headers are in row 1
             favourite_value = row[1]  # Assuming the "Favourite" column is the second column (0-based index)
             isselected_value = row[0]  # Assuming the "Selected" column is the first column (0-based index)
+            if row[4] is None:  # blank rows below the data
+                continue
             id_value = row[4].split('-')[0]  # Assuming the "ID" column is the second column (0-based index)
             if not id_value in favourites_data: 
                 favourites_data[id_value] = favourite_value
@@ -134,69 +115,90 @@ def read_excel_source(path: str):
                 is_selected_data[id_value] = isselected_value
             
         source_workbook.close()
+        save_merge_cache(path, favourites_data, is_selected_data)
     
     return favourites_data, is_selected_data
 
 
-def write_excel_destination(path: str, items):
+COLUMNS = [
+    ("selected", 5),
+    ("Favourite", 5),
+    ("FavoriteAWS", 8),
+    ("IsNew", 7),
+    ("ID", 12),
+    ("Title", 80),
+    ("Description", 110),
+    ("TrackName", 16),
+    ("Venue", 14),
+    ("StartTime", 18),
+    ("EndTime", 18),
+    ("Day", 11),
+    ("Type", 16),
+    ("Tags", 110),
+    ("scheduleUid", 20),
+    ("sessionUid", 20),
+]
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+FAVOURITE_COLUMN = COLUMN_NAMES.index("Favourite")
 
-    workbook = xlsxwriter.Workbook(path, {'default_row_height': 20})
+WORKBOOK_OPTIONS = {'default_row_height': 20}
 
-    workbook = xlsxwriter.Workbook("reinvent.xlsx", {'default_row_height': 20})
-    
-    cell_format = workbook.add_format({'text_wrap': True, "font_size": 12})
-    favorite_format = workbook.add_format({'text_wrap': False, "font_size": 12})
-    bold_format = workbook.add_format({'bold': 1, 'text_wrap': True, "font_size": 12})
-
-    columns = [
-        ("selected", 5),
-        ("Favourite", 5),
-        ("FavoriteAWS", 8),
-        ("IsNew", 7),
-        ("ID", 12),
-        ("Title", 80),
-        ("Description", 110),
-        ("TrackName", 16),
-        ("Venue", 14),
-        ("StartTime", 18),
-        ("EndTime", 18),
-        ("Day", 11),
-        ("Type", 16),
-        ("Tags", 110),
-        ("scheduleUid", 20),
-        ("sessionUid", 20),
-    ]
-    # Get the list of keys and move the ALL and Favourites to the top
-    keys = list(items.keys())
-    
-    if "ALL" in keys: 
-        keys.remove("ALL")
-        keys.insert(0, "ALL")
-        
-    for key in keys:
-        category = items.get(key, [])
-        worksheet = workbook.add_worksheet(key)
 
-        # Write the header row
-        for col_num, (header, width) in enumerate(columns):
-            worksheet.write(0, col_num, header, bold_format)
-            worksheet.set_column(col_num, col_num, width)
+def is_blank(value) -> bool:
+    return value is None or (isinstance(value, str) and value.strip() == "")
 
-        row = 1
-        for item in category:
-            element = item["Favourite"]
-            if element is None or (isinstance(element, str) and element.strip() == ""):
-                format = cell_format 
-            else:
-                format = favorite_format 
 
+def add_formats(workbook):
+    cell_format = workbook.add_format({'text_wrap': True, "font_size": 12})
+    favorite_format = workbook.add_format({'text_wrap': False, "font_size": 12})
+    bold_format = workbook.add_format({'bold': 1, 'text_wrap': True, "font_size": 12})
+    return cell_format, favorite_format, bold_format
+
+
+def write_header(worksheet, bold_format, columns=COLUMNS):
+    for col_num, (header, width) in enumerate(columns):
+        worksheet.write(0, col_num, header, bold_format)
+        worksheet.set_column(col_num, col_num, width)
+
+
+def write_excel_streaming(path: str, rows, sheet_name: str = "ALL", extra_sheets=()) -> int:
+    """
+    Write rows (tuples in COLUMN_NAMES order) to a workbook as they are produced.
+    xlsxwriter's constant_memory mode flushes each row to disk once the next one
+    starts, so memory stays flat whatever the number of rows.
+    extra_sheets are (name, columns, rows) written after the sessions sheet.
+    Returns the number of session rows written.
+    """
+    workbook = xlsxwriter.Workbook(path, {**WORKBOOK_OPTIONS, 'constant_memory': True})
+    cell_format, favorite_format, bold_format = add_formats(workbook)
+    worksheet = workbook.add_worksheet(sheet_name)
+    write_header(worksheet, bold_format)
+
+    row_count = 0
+    for row_count, row in enumerate(rows, start=1):
+        format = cell_format if is_blank(row[FAVOURITE_COLUMN]) else favorite_format
+        worksheet.write_row(row_count, 0, row, format)
+
+    for name, columns, extra_rows in extra_sheets:
+        worksheet = workbook.add_worksheet(name)
+        write_header(worksheet, bold_format, columns)
+        for row_num, row in enumerate(extra_rows, start=1):
+            worksheet.write_row(row_num, 0, row, cell_format)
 
-            for col_num, (column_name, _) in enumerate(columns):
-                worksheet.write(row, col_num, item.get(column_name, ""), format)
+    workbook.close()
+    return row_count
 
-            row += 1
 
-    workbook.close()
+def write_workbook(path: str, table, split=(), workers=None, extra_sheets=(), incremental=False) -> None:
+    if incremental:
+        # Changed rows only, copying the sheets nothing changed on; a full export the first time
+        update_workbook(path, table, COLUMNS, split, workers, extra_sheets)
+    elif split:
+        # ALL plus a sheet per track/day/venue/type, rendered across a process pool
+        export_workbook(path, table, COLUMNS, split, workers, extra_sheets)
+    else:
+        # One row at a time
+        write_excel_streaming(path, table.rows(COLUMN_NAMES), extra_sheets=extra_sheets)
 
 
 if __name__ == "__main__":
@@ -207,8 +209,8 @@ if __name__ == "__main__":
     source_file_path = args.source_file
     
     # Load our sessions.json
-    with open("sessions.json", "r") as f:
-        sessions = json.load(f)
+    with tracing.span("catalog.read"):
+        sessions = load_sessions(args.sessions)
     
     # Read our source excel which now has our favourites (where we can whatever markup we want) 
     #    and another column where I keep track of those I want to select for realz
@@ -216,7 +218,8 @@ if __name__ == "__main__":
     is_selected_data = []
     # Note: For the old xlsx file, be sure to remove filters and unfreeze rows else it'll break
     #       Continues to expect the ALL tab
-    favourites_data, is_selected_data = read_excel_source(source_file_path)
+    with tracing.span("excel.read"):
+        favourites_data, is_selected_data = read_excel_source(source_file_path)
     
     # Iterate thru Session data and do stuff to it for easy writing to Excel in next step
     #  - Cleanup date/times
@@ -224,7 +227,26 @@ if __name__ == "__main__":
     #  - apply selected element to dataset
     #  - Mark new items as new (since last excel spreadsheet)
     #  - apply Favourite element to dataset from excel
-    items = parse_sessions(sessions, favourites_data, is_selected_data)
+    #  (normalize_sessions does this column by column)
+    print( f"There are currently {len(sessions)} sessions" )
+    with tracing.span("parse_sessions", sessions=len(sessions)):
+        table = normalize_sessions(sessions, favourites_data, is_selected_data)
     
+    # Look for selected/favourite sessions that overlap or are too far apart to walk between
+    extra_sheets = []
+    if args.conflicts:
+        if args.travel_times:
+            travel = TravelTimes.load(args.travel_times, args.default_travel)
+        else:
+            travel = TravelTimes(default=args.default_travel)
+        with tracing.span("conflicts"):
+            conflicts = find_conflicts(chosen_intervals(table), travel)
+        print( f"Found {len(conflicts)} conflicts between chosen sessions" )
+        write_conflicts_json(args.conflicts_json, conflicts)
+        extra_sheets.append(("Conflicts", CONFLICT_COLUMNS, conflict_rows(conflicts)))
+
     # Write modified session data to Excel
-    write_excel_destination("reinvent.xlsx", items)
+    with tracing.span("excel.write"):
+        write_workbook("reinvent.xlsx", table, args.split, args.workers, extra_sheets, args.incremental)
+
+    tracing.write_outputs(args.trace_file, args.metrics_file)
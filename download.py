@@ -2,25 +2,59 @@
 import logging
 from requests.sessions import RequestsCookieJar
 from srp.aws_srp import AWSSRP
-from typing import Dict, Tuple
+from srp.cognito_http import CognitoHttpClient
+from srp.ephemeral import EphemeralPool
+from catalog_sync import CatalogStore
+from credential_cache import CredentialCache, DEFAULT_CACHE_DIR, token_expired
+from catalog_storage import load_sessions, save_sessions
+from json_stream import iter_array_items
+import tracing
+from rate_limit import RateLimitedAdapter, RateLimiter
+from transport import (
+    CircuitBreaker,
+    HubResponseError,
+    ResilientSession,
+    RetryPolicy,
+    call_with_retries,
+    expect_status,
+    is_transient,
+)
+from functools import partial
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import hashlib
 import json
+import os
 import re
 import requests
+import sys
+import threading
 import click
 
 COGNITO_CLIENT_ID = "4mbpjh0cd78jbbu5kc5i9717v"
 USER_POOL_ID = "us-east-1_iu3YTdfT3"
 
-ROOT_DOMAIN = "https://hub.reinvent.awsevents.com"
+# The endpoints can be pointed elsewhere, e.g. at benchmarks/mock_hub.py
+ROOT_DOMAIN = os.environ.get("REINVENT_HUB_URL", "https://hub.reinvent.awsevents.com")
+HUB_HOST = urlparse(ROOT_DOMAIN).netloc
+COGNITO_ENDPOINT = os.environ.get("REINVENT_COGNITO_URL")  # None: the AWS endpoint
+COGNITO_HOST = (
+    urlparse(COGNITO_ENDPOINT).netloc if COGNITO_ENDPOINT else "cognito-idp.us-east-1.amazonaws.com"
+)
 ATTENDEE_PORTAL_URL = f"{ROOT_DOMAIN}/attendee-portal/"
 USER_URL = f"{ROOT_DOMAIN}/attendee-portal-api/user/"
 FAVORITES_URL = f"{ROOT_DOMAIN}/attendee-portal-api/events/getUserReservations/?user_uuid="
 SESSIONS_URL = f"{ROOT_DOMAIN}/attendee-portal-api/sessions/list/"
-GET_COOKIES_URL = (
-    "https://hub.reinvent.awsevents.com/auth/login/cognito/?code={code}&state={state}"
+GET_COOKIES_URL = f"{ROOT_DOMAIN}/auth/login/cognito/?code={{code}}&state={{state}}"
+STORAGE_URL = os.environ.get(
+    "REINVENT_STORAGE_URL", "https://28ym3tywek.execute-api.us-east-1.amazonaws.com/storage"
 )
-STORAGE_URL = "https://28ym3tywek.execute-api.us-east-1.amazonaws.com/storage"
 REDACT_LOGS = True
+SESSIONS_FILE = "sessions.json"
+# What the hub answers once its session cookie has expired
+SESSION_EXPIRED_STATUSES = (401, 403)
 
 
 logging.basicConfig(level=logging.INFO)
@@ -34,7 +68,7 @@ def call_attendee_portal_url(session: requests.Session) -> str:
         allow_redirects=False,
         headers={
             "accept-encoding": "deflate, gzip",
-            "authority": "hub.reinvent.awsevents.com",
+            "authority": HUB_HOST,
             "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
             "accept-language": "en-US,en;q=0.9",
             "cache-control": "no-cache",
@@ -51,13 +85,10 @@ def call_attendee_portal_url(session: requests.Session) -> str:
         },
     )
 
-    if response.status_code != 302:
-        raise Exception(
-            f"Response status code should be 302, but is {response.status_code}"
-        )
+    expect_status(response, 302)
 
     if "Location" not in response.headers:
-        raise Exception("Response should have Location header")
+        raise HubResponseError("Response should have Location header", response)
 
     redirect_location = response.headers["Location"]
 
@@ -79,8 +110,8 @@ def call_user_url(session: requests.Session) -> str:
             "accept-language": "en-US,en;q=0.9",
             # "cache-control": "no-cache",
             # "pragma": "no-cache",
-            "host": "hub.reinvent.awsevents.com",
-            "referer": "https://hub.reinvent.awsevents.com/attendee-portal/agenda/",
+            "host": HUB_HOST,
+            "referer": f"{ROOT_DOMAIN}/attendee-portal/agenda/",
             "connection": "keep-alive",
             "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15",
             # "sec-ch-ua": '"Not/A)Brand";v="99", "Google Chrome";v="115", "Chromium";v="115"',
@@ -94,8 +125,10 @@ def call_user_url(session: requests.Session) -> str:
     )
 
     logger.debug(f" - Status code: {response.status_code}")
-    logger.info(f" - Results: {response.text}")
-    data = json.loads(response.text)
+    expect_status(response, 200)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f" - Results: {response.text}")
+    data = response.json()
     user_uid = data["data"]["userUid"]
     logger.debug(f" - UserID: {user_uid}")
     return user_uid
@@ -108,13 +141,10 @@ def call_login_url(session: requests.Session, url) -> str:
         allow_redirects=False,
     )
 
-    if response.status_code != 302:
-        raise Exception(
-            f"Response status code should be 302, but is {response.status_code}"
-        )
+    expect_status(response, 302)
 
     if "Location" not in response.headers:
-        raise Exception("Response should have Location header")
+        raise HubResponseError("Response should have Location header", response)
 
     redirect_location = response.headers["Location"]
 
@@ -134,13 +164,10 @@ def call_authorize_url(session: requests.Session, url) -> Tuple[str, str]:
         allow_redirects=False,
     )
 
-    if response.status_code != 302:
-        raise Exception(
-            f"Response status code should be 302, but is {response.status_code}"
-        )
+    expect_status(response, 302)
 
     if "Location" not in response.headers:
-        raise Exception("Response should have Location header")
+        raise HubResponseError("Response should have Location header", response)
 
     redirect_location = response.headers["Location"]
 
@@ -181,18 +208,39 @@ def redact(string: str) -> str:
     else:
         return string
 
-def get_tokens(username: str, password: str) -> Tuple[str, str, str]:
+
+def cognito_client(kind: str = "boto3"):
+    if kind == "http":
+        return CognitoHttpClient("us-east-1", COGNITO_ENDPOINT)
+    # boto3 takes longer to import than the rest of this script, so only load it when used
+    import boto3
+
+    return boto3.client("cognito-idp", region_name="us-east-1", endpoint_url=COGNITO_ENDPOINT)
+
+
+def get_tokens(
+    username: str,
+    password: str,
+    retry: Optional[Callable] = None,
+    ephemeral_pool: Optional[EphemeralPool] = None,
+    cognito: str = "boto3",
+) -> Tuple[str, str, str]:
     logger.info(f"Getting cognito tokens")
 
     # Get tokens
-    aws = AWSSRP(
-        username=username,
-        password=password,
-        pool_id=USER_POOL_ID,
-        client_id=COGNITO_CLIENT_ID,
-        pool_region="us-east-1",
-    )
-    tokens = aws.authenticate_user()
+    with tracing.span("srp.setup"):
+        aws = AWSSRP(
+            username=username,
+            password=password,
+            pool_id=USER_POOL_ID,
+            client_id=COGNITO_CLIENT_ID,
+            client=cognito_client(cognito),
+            retry=retry,
+            ephemeral_pool=ephemeral_pool,
+        )
+    # The self time of this span is the SRP arithmetic, the Cognito calls are child spans
+    with tracing.span("srp.authenticate"):
+        tokens = aws.authenticate_user()
 
     access_token = tokens["AuthenticationResult"]["AccessToken"]
     refresh_token = tokens["AuthenticationResult"]["RefreshToken"]
@@ -203,6 +251,31 @@ def get_tokens(username: str, password: str) -> Tuple[str, str, str]:
 
     return access_token, refresh_token, id_token
 
+
+def refresh_tokens(
+    refresh_token: str, retry: Optional[Callable] = None, cognito: str = "boto3"
+) -> Tuple[str, str, str]:
+    logger.info(f"Refreshing cognito tokens")
+
+    client = cognito_client(cognito)
+    retry = retry or (lambda method, **kwargs: method(**kwargs))
+    tokens = retry(
+        client.initiate_auth,
+        AuthFlow="REFRESH_TOKEN_AUTH",
+        AuthParameters={"REFRESH_TOKEN": refresh_token},
+        ClientId=COGNITO_CLIENT_ID,
+    )
+
+    access_token = tokens["AuthenticationResult"]["AccessToken"]
+    id_token = tokens["AuthenticationResult"]["IdToken"]
+    # Cognito only rotates the refresh token if the app client is configured to
+    refresh_token = tokens["AuthenticationResult"].get("RefreshToken", refresh_token)
+    logger.info(f" - access_token: {redact(access_token)}")
+    logger.info(f" - id_token: {redact(id_token)}")
+
+    return access_token, refresh_token, id_token
+
+
 def perform_storage_call(
     session: requests.Session, authorization_code, access_token, refresh_token, id_token
 ) -> None:
@@ -232,7 +305,10 @@ def perform_storage_call(
         ),
     )
     logger.info(f" - Status code: {response.status_code}")
-
+    if response.status_code >= 400:
+        raise HubResponseError(
+            f"Storage call failed with status code {response.status_code}", response
+        )
 
 
 def get_cookies(
@@ -257,92 +333,410 @@ def get_cookies(
             "upgrade-insecure-requests": "1",
         },
     )
-    if response.status_code != 302:
-        raise Exception(
-            f"Response status code should be 302, but is {response.status_code}"
-        )
+    expect_status(response, 302)
 
     logger.info(f" - Status code: {response.status_code}")
     
     return response.cookies
 
 
-def fetch_sessions(username: str, password: str):
-    session = requests.Session()
-    attendee_portal_redirect_location = call_attendee_portal_url(session)
-    login_redirect_location = call_login_url(session, attendee_portal_redirect_location)
-    authorization_code, state_code = call_authorize_url(
-        session, login_redirect_location
-    )
+API_HEADERS = {
+    "accept": "application/json,text/plain,*/*",
+    "accept-language": "en-US,en;q=0.9",
+    # "cache-control": "no-cache",
+    # "pragma": "no-cache",
+    "host": HUB_HOST,
+    "referer": f"{ROOT_DOMAIN}/attendee-portal/agenda/",
+    "connection": "keep-alive",
+    "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15",
+    # "sec-ch-ua": '"Not/A)Brand";v="99", "Google Chrome";v="115", "Chromium";v="115"',
+    # "sec-ch-ua-mobile": "?0",
+    # "sec-ch-ua-platform": '"macOS"',
+    "sec-fetch-dest": "empty",
+    "sec-fetch-mode": "cors",
+    "sec-fetch-site": "same-origin",
+    "x-requested-with": "XMLHttpRequest",
+}
+
+
+class HubClient:
+    """
+    Logs in to the attendee portal once and serves every hub API call
+    from a single pooled requests.Session holding the hub cookies.
+
+    With a CredentialCache the cookies and Cognito tokens of the previous run
+    are reused while the hub accepts them; expired tokens are refreshed with
+    the refresh token before falling back to a full SRP login.
+
+    Every request is retried with backoff behind a per-host circuit breaker
+    (see transport.py). A login that still fails on a transient error keeps the
+    steps it completed, so the next attempt resumes from the step that failed. A
+    request rejected because the hub session has expired logs in again and is
+    sent once more.
+    """
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        cache: Optional[CredentialCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        policy: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        ephemeral_pool: Optional[EphemeralPool] = None,
+        cognito: str = "boto3",
+    ):
+        self.username = username
+        self.password = password
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.ephemeral_pool = ephemeral_pool
+        self.cognito = cognito
+        self.session = ResilientSession(self.policy, self.breaker)
+        if rate_limiter is not None:
+            adapter = RateLimitedAdapter(rate_limiter, pool_connections=4, pool_maxsize=8)
+        else:
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.hooks["response"].append(self._record_timing)
+        self._cognito_call = partial(
+            call_with_retries, host=COGNITO_HOST, policy=self.policy, breaker=self.breaker
+        )
+        self.timings: List[Dict] = []
+        self.logged_in = False
+        # Serialises logins between threads sharing the client; the count tells a thread
+        # whose request was rejected whether another one has logged in again since
+        self._login_lock = threading.Lock()
+        self._login_count = 0
+        self.tokens: Optional[Dict] = None
+        self._user_uid = None
+        # Results of the login steps completed so far, cleared once logged in
+        self._login_progress: Dict = {}
+
+    def cognito_retry(self, method: Callable, **kwargs):
+        # One span per Cognito round trip, retries included
+        with tracing.span(f"cognito.{method.__name__}"):
+            return self._cognito_call(method, **kwargs)
+
+    def _record_timing(self, response: requests.Response, *args, **kwargs) -> None:
+        tracing.add("http_requests")
+        # Streamed bodies are counted by whoever reads them
+        if not kwargs.get("stream"):
+            tracing.add("bytes_in", len(response.content))
+        # elapsed covers sending the request up to the response headers being parsed
+        self.timings.append(
+            {
+                "method": response.request.method,
+                "url": redact(response.url),
+                "status": response.status_code,
+                "ms": response.elapsed.total_seconds() * 1000,
+            }
+        )
 
-    access_token, refresh_token, id_token = get_tokens(username, password)
-    perform_storage_call(
-        session, authorization_code, access_token, refresh_token, id_token
-    )
+    def log_timings(self) -> None:
+        logger.info("Request timings (time to response headers):")
+        for t in self.timings:
+            logger.info(f" - {t['method']} {t['url']} {t['status']} in {t['ms']:.0f} ms")
+
+    def _get_tokens(self) -> Tuple[str, str, str]:
+        if self.tokens and not token_expired(self.tokens.get("access_token")):
+            logger.info("Reusing cached cognito tokens")
+            return (
+                self.tokens["access_token"],
+                self.tokens["refresh_token"],
+                self.tokens["id_token"],
+            )
+        # Cognito is not called through self.session, so limit it here
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(COGNITO_HOST)
+        if self.tokens and self.tokens.get("refresh_token"):
+            try:
+                return refresh_tokens(
+                    self.tokens["refresh_token"], self.cognito_retry, self.cognito
+                )
+            except Exception as e:
+                logger.info(f" - Token refresh failed ({e}), doing a full login")
+        return get_tokens(
+            self.username, self.password, self.cognito_retry, self.ephemeral_pool, self.cognito
+        )
 
-    cookies = get_cookies(session, authorization_code, state_code)
-    
-    headers={
-        "accept": "application/json,text/plain,*/*",
-        "accept-language": "en-US,en;q=0.9",
-        # "cache-control": "no-cache",
-        # "pragma": "no-cache",
-        "host": "hub.reinvent.awsevents.com",
-        "referer": "https://hub.reinvent.awsevents.com/attendee-portal/agenda/",
-        "connection": "keep-alive",
-        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15",
-        # "sec-ch-ua": '"Not/A)Brand";v="99", "Google Chrome";v="115", "Chromium";v="115"',
-        # "sec-ch-ua-mobile": "?0",
-        # "sec-ch-ua-platform": '"macOS"',
-        "sec-fetch-dest": "empty",
-        "sec-fetch-mode": "cors",
-        "sec-fetch-site": "same-origin",
-        "x-requested-with": "XMLHttpRequest",
-    }
+    def login(self) -> None:
+        with tracing.span("login"):
+            try:
+                self._run_login_steps()
+            except Exception as e:
+                # Each step was already retried by the transport; a transient failure keeps
+                # the steps done so far for the next login, anything else starts it over
+                if not is_transient(e):
+                    self._login_progress = {}
+                raise
+
+    def _run_login_steps(self) -> None:
+        session = self.session
+        progress = self._login_progress
+        if "attendee_portal_redirect" not in progress:
+            session.cookies.clear()
+            self._user_uid = None
+            with tracing.span("login.attendee_portal"):
+                progress["attendee_portal_redirect"] = call_attendee_portal_url(session)
+        if "login_redirect" not in progress:
+            with tracing.span("login.login_redirect"):
+                progress["login_redirect"] = call_login_url(
+                    session, progress["attendee_portal_redirect"]
+                )
+        if "authorization" not in progress:
+            with tracing.span("login.authorize"):
+                progress["authorization"] = call_authorize_url(
+                    session, progress["login_redirect"]
+                )
+        authorization_code, state_code = progress["authorization"]
+
+        if "tokens" not in progress:
+            with tracing.span("login.tokens"):
+                access_token, refresh_token, id_token = self._get_tokens()
+            self.tokens = {
+                "access_token": access_token,
+                "refresh_token": refresh_token,
+                "id_token": id_token,
+            }
+            progress["tokens"] = True
+        if "storage" not in progress:
+            with tracing.span("login.storage"):
+                perform_storage_call(
+                    session,
+                    authorization_code,
+                    self.tokens["access_token"],
+                    self.tokens["refresh_token"],
+                    self.tokens["id_token"],
+                )
+            progress["storage"] = True
+
+        with tracing.span("login.cookies"):
+            cookies = get_cookies(session, authorization_code, state_code)
+        session.cookies.update(cookies)
+        self._login_progress = {}
+        self.logged_in = True
+        self._login_count += 1
+
+        if self.cache is not None:
+            self.cache.save(session.cookies, self.tokens)
+
+    def _restore_from_cache(self) -> bool:
+        cached = self.cache.load() if self.cache is not None else None
+        if cached is None:
+            return False
+
+        # The hub cookies outlive the one-hour access token, so they are tried whatever its
+        # expiry; _get_tokens refreshes the tokens if a full login turns out to be needed
+        self.tokens = cached["tokens"]
+        if token_expired(self.tokens.get("access_token")):
+            logger.info("Cached access token has expired, trying the cached hub cookies")
+
+        self.session.cookies.update(cached["cookies"])
+        try:
+            # The user lookup doubles as a check that the hub still accepts the cookies
+            self._user_uid = call_user_url(self.session)
+        except (ValueError, KeyError, HubResponseError):
+            logger.info("Cached cookies were rejected by the hub")
+            self._user_uid = None
+            return False
+
+        logger.info("Reusing cached hub session")
+        return True
+
+    def ensure_logged_in(self) -> None:
+        if self.logged_in:
+            return
+        with self._login_lock:
+            if self.logged_in:
+                return
+            if self._restore_from_cache():
+                self.logged_in = True
+                self._login_count += 1
+            else:
+                self.login()
+
+    def get(
+        self, url: str, headers: Optional[Dict] = None, stream: bool = False
+    ) -> requests.Response:
+        self.ensure_logged_in()
+        headers = {**API_HEADERS, **(headers or {})}
+        login_count = self._login_count
+        response = self.session.get(url, headers=headers, stream=stream)
+        if response.status_code in SESSION_EXPIRED_STATUSES:
+            logger.info(f"Hub session rejected ({response.status_code}), logging in again")
+            response.close()
+            self.relogin(login_count)
+            response = self.session.get(url, headers=headers, stream=stream)
+        return response
+
+    def relogin(self, rejected_login: Optional[int] = None) -> None:
+        """
+        Log in again. `rejected_login` is the login count when the rejected request
+        was sent: if another thread has logged in since, its session is used instead.
+        """
+        with self._login_lock:
+            if rejected_login is not None and rejected_login != self._login_count:
+                logger.info("Hub session already renewed by another request")
+                return
+            self.logged_in = False
+            self._user_uid = None
+            self.login()
+
+    def get_json(self, url: str) -> Dict:
+        with tracing.span("http.get", url=redact(url)):
+            response = expect_status(self.get(url), 200)
+        with tracing.span("json.decode"):
+            return response.json()
+
+    def user_uid(self) -> str:
+        self.ensure_logged_in()
+        if self._user_uid is None:
+            with tracing.span("fetch.user"):
+                self._user_uid = call_user_url(self.session)
+        return self._user_uid
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "HubClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def fetch_sessions(client: HubClient):
+    with tracing.span("fetch.sessions"):
+        sessions: Dict = client.get_json(SESSIONS_URL)["data"]
+    return sessions
+
+
+def iter_sessions(client: HubClient) -> Iterator[Dict]:
+    """
+    Yield sessions one at a time as they are parsed from the response stream,
+    without holding the whole catalog in memory.
+    """
+    with client.get(SESSIONS_URL, stream=True) as response:
+        expect_status(response, 200)
+
+        def counted_chunks():
+            for chunk in response.iter_content(chunk_size=65536):
+                tracing.add("bytes_in", len(chunk))
+                yield chunk
 
-    list_response = requests.get(SESSIONS_URL, cookies=cookies, headers=headers)
-    sessions: Dict = list_response.json()["data"]
+        yield from iter_array_items(counted_chunks())
+
+
+def fetch_favorites(client: HubClient):
+    user_uid = client.user_uid()
+    with tracing.span("fetch.favorites"):
+        sessions: Dict = client.get_json(FAVORITES_URL + user_uid)["data"]
     return sessions
 
 
-def fetch_favorites(username: str, password: str):
-    session = requests.Session()
-    attendee_portal_redirect_location = call_attendee_portal_url(session)
-    login_redirect_location = call_login_url(session, attendee_portal_redirect_location)
-    authorization_code, state_code = call_authorize_url(
-        session, login_redirect_location
-    )
+def run_concurrently(calls: Dict[str, Callable]) -> Dict:
+    """
+    Run independent calls on a thread pool and return their results by name,
+    logging how long each one took end to end.
+    """
+
+    def timed(name: str, call: Callable):
+        with tracing.span(name) as span:
+            result = call()
+        logger.info(f"{name} finished in {span.duration * 1000:.0f} ms")
+        return result
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        futures = {name: pool.submit(timed, name, call) for name, call in calls.items()}
+        return {name: future.result() for name, future in futures.items()}
+
 
-    access_token, refresh_token, id_token = get_tokens(username, password)
-    perform_storage_call(
-        session, authorization_code, access_token, refresh_token, id_token
+def validators_path(sessions_path: str) -> str:
+    # One per output, so runs writing different files don't skip each other's changes
+    return sessions_path + ".validators.json"
+
+
+def load_validators(sessions_path: str) -> Dict:
+    path = validators_path(sessions_path)
+    # Validators are only meaningful while the file they describe still exists
+    if not os.path.exists(path) or not os.path.exists(sessions_path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_validators(validators: Dict, sessions_path: str) -> None:
+    with open(validators_path(sessions_path), "w") as f:
+        json.dump(validators, f)
+
+
+def fetch_if_changed(client: HubClient, url: str, validators: Dict) -> Optional[Dict]:
+    """
+    Conditionally GET `url`, returning the decoded "data" member, or None if the
+    resource is unchanged since `validators` were recorded.
+
+    The server's ETag/Last-Modified are sent back as If-None-Match/If-Modified-Since.
+    When the server ignores them (or sends neither) the body hash is compared before
+    the JSON is parsed. `validators` is updated in place with the new values.
+    """
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    with tracing.span("http.get", url=redact(url)):
+        response = client.get(url, headers)
+    logger.debug(f" - Status code: {response.status_code}")
+    expect_status(response, 200, 304)
+    if response.status_code == 304:
+        return None
+
+    with tracing.span("hash"):
+        body_hash = hashlib.sha256(response.content).hexdigest()
+    unchanged = body_hash == validators.get("sha256")
+    validators.update(
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+        sha256=body_hash,
     )
+    if unchanged:
+        return None
+    with tracing.span("json.decode"):
+        return response.json()["data"]
 
-    cookies = get_cookies(session, authorization_code, state_code)
-    headers={
-        "accept": "application/json,text/plain,*/*",
-        "accept-language": "en-US,en;q=0.9",
-        # "cache-control": "no-cache",
-        # "pragma": "no-cache",
-        "host": "hub.reinvent.awsevents.com",
-        "referer": "https://hub.reinvent.awsevents.com/attendee-portal/agenda/",
-        "connection": "keep-alive",
-        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15",
-        # "sec-ch-ua": '"Not/A)Brand";v="99", "Google Chrome";v="115", "Chromium";v="115"',
-        # "sec-ch-ua-mobile": "?0",
-        # "sec-ch-ua-platform": '"macOS"',
-        "sec-fetch-dest": "empty",
-        "sec-fetch-mode": "cors",
-        "sec-fetch-site": "same-origin",
-        "x-requested-with": "XMLHttpRequest",
-    }
 
-    user_uid = call_user_url(session)
-    list_response = requests.get(FAVORITES_URL + user_uid, cookies=cookies, headers=headers)
-    sessions: Dict = list_response.json()["data"]
+def load_saved_sessions(path: str):
+    sessions = load_sessions(path)
+    # Favourite flags are re-applied from the latest favorites list
+    for session in sessions:
+        session.pop("isFavorite", None)
     return sessions
 
 
+def stream_sessions(client: HubClient, output: str) -> None:
+    favorites_data = fetch_favorites(client)
+    favorite_uids = {
+        favorite_session["scheduleUid"]
+        for favorite_session in favorites_data.get("followedSessions", [])
+    }
+
+    def flagged_sessions():
+        for session in iter_sessions(client):
+            session["isFavorite"] = session["scheduleUid"] in favorite_uids
+            yield session
+
+    logger.info( "Saving sessions...")
+    with tracing.span("fetch.sessions_stream"):
+        count = save_sessions(output, flagged_sessions())
+    logger.info(f" - {count} sessions written")
+    logger.info( "Done!")
+
+
 @click.command()
 @click.option('--username', prompt='AWS Portal username',
             help='Your AWS re:Invent portal account username.')
@@ -350,39 +744,163 @@ def fetch_favorites(username: str, password: str):
     "--password", prompt='AWS Portal password', hide_input=True,
     help='Your AWS re:Invent portal account password.'
 )
-def main(username, password):
+@click.option(
+    "--cache-credentials/--no-cache-credentials", default=False,
+    help='Keep the hub cookies and Cognito tokens in an encrypted local cache between runs.'
+)
+@click.option(
+    "--cache-dir", default=DEFAULT_CACHE_DIR, show_default=True,
+    help='Directory for the encrypted credential cache.'
+)
+@click.option(
+    "--sync-dir", default=None,
+    help='Keep an incremental catalog store in this directory, log added/modified/removed sessions '
+         'to its change log and only rewrite sessions.json when something changed.'
+)
+@click.option(
+    "--conditional/--no-conditional", default=False,
+    help='Only download and rewrite sessions.json when the catalog or favorites changed since the last run '
+         '(uses ETag/Last-Modified or a body hash, kept next to the output in <output>.validators.json).'
+)
+@click.option(
+    "--exit-code-if-unchanged", default=0, show_default=True,
+    help='Exit status to use when --conditional finds nothing changed, e.g. to skip display.py in a script.'
+)
+@click.option(
+    "--stream/--no-stream", default=False,
+    help='Parse the catalog as it downloads and write each session straight to sessions.json, keeping '
+         'memory flat for very large catalogs. Sessions are kept in catalog order rather than sorted by title.'
+)
+@click.option(
+    "--output", default=SESSIONS_FILE, show_default=True,
+    help='Where to save the catalog. The format follows the extension: .json, .min.json (compact JSON), '
+         '.msgpack or .sqlite.'
+)
+@click.option(
+    "--concurrent/--sequential", default=True, show_default=True,
+    help='After logging in, fetch the sessions list and the favorites (user lookup, then favorites) in parallel.'
+)
+@click.option(
+    "--cognito-client", type=click.Choice(["boto3", "http"]), default="boto3", show_default=True,
+    help='Log in to Cognito through boto3, or through a small built-in HTTP client that starts much faster.'
+)
+@click.option(
+    "--trace-file", default=None,
+    help='Write a timing trace of every stage (login hops, Cognito calls, fetches, decoding, writing) to this '
+         'file, in the Chrome trace format read by chrome://tracing and ui.perfetto.dev.'
+)
+@click.option(
+    "--metrics-file", default=None,
+    help='Write per-stage durations, bytes transferred and peak memory to this file in the Prometheus text format.'
+)
+@click.option(
+    "--debug/--no-debug", default=False,
+    help='Log at debug level, including the full user and favorites responses.'
+)
+def main(username, password, cache_credentials, cache_dir, sync_dir, conditional, exit_code_if_unchanged, stream, output, concurrent, cognito_client, trace_file, metrics_file, debug):
+    if debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+    try:
+        with tracing.span("download"):
+            download_catalog(
+                username, password, cache_credentials, cache_dir, sync_dir, conditional,
+                exit_code_if_unchanged, stream, output, concurrent, cognito_client,
+            )
+    finally:
+        tracing.write_outputs(trace_file, metrics_file)
+
+
+def download_catalog(username, password, cache_credentials, cache_dir, sync_dir, conditional, exit_code_if_unchanged, stream, output, concurrent, cognito_client):
+
+    if stream and (sync_dir is not None or conditional):
+        raise click.UsageError("--stream cannot be combined with --sync-dir or --conditional")
 
     logger.info( "Retrieving sessions...")
 
-    sessions_data = fetch_sessions(username, password)
-    favorites_data = fetch_favorites(username, password)
-    
-    logging.info("Contents of favorites_data:")
-    logging.info(json.dumps(favorites_data, indent=4))
+    cache = CredentialCache(username, password, cache_dir) if cache_credentials else None
+    with HubClient(username, password, cache, cognito=cognito_client) as client:
+        if stream:
+            return stream_sessions(client, output)
+        # Log in (or restore the cached session) before fanning out the data requests
+        client.ensure_logged_in()
+        if conditional:
+            validators = load_validators(output)
+            sessions_validators = validators.setdefault("sessions", {})
+            favorites_validators = validators.setdefault("favorites", {})
+            calls = {
+                "Sessions list": lambda: fetch_if_changed(
+                    client, SESSIONS_URL, sessions_validators
+                ),
+                "Favorites list": lambda: fetch_if_changed(
+                    client, FAVORITES_URL + client.user_uid(), favorites_validators
+                ),
+            }
+        else:
+            calls = {
+                "Sessions list": lambda: fetch_sessions(client),
+                "Favorites list": lambda: fetch_favorites(client),
+            }
+
+        if concurrent:
+            results = run_concurrently(calls)
+        else:
+            results = {name: call() for name, call in calls.items()}
+        client.log_timings()
+        sessions_data = results["Sessions list"]
+        favorites_data = results["Favorites list"]
+
+        if conditional:
+            if sessions_data is None and favorites_data is None:
+                logger.info("Catalog and favorites unchanged, nothing to do")
+                sys.exit(exit_code_if_unchanged)
+            if sessions_data is None:
+                # Only the favorites changed: still a change, the flags in the output are rewritten
+                logger.info("Catalog unchanged, favorites changed")
+                sessions_data = load_saved_sessions(output)
+            if favorites_data is None:
+                favorites_data = fetch_favorites(client)
     
-    # Extract the favorite sessions
-    favorite_sessions = favorites_data.get("followedSessions", [])
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Contents of favorites_data:\n{json.dumps(favorites_data, indent=4)}")
     
-    # Create a dictionary to look up sessions by scheduleUid
-    session_dict = {session["scheduleUid"]: session for session in sessions_data}
-
-    # Add the favorite flag to the corresponding sessions
-    for favorite_session in favorite_sessions:
-        schedule_uid = favorite_session["scheduleUid"]
-        if schedule_uid in session_dict:
-            session_dict[schedule_uid]["isFavorite"] = True
-            
-    # Mark all other sessions as not favorite
-    for session in sessions_data:
-        if "isFavorite" not in session:
-            session["isFavorite"] = False
+    with tracing.span("merge_favorites"):
+        # Extract the favorite sessions
+        favorite_sessions = favorites_data.get("followedSessions", [])
+
+        # Create a dictionary to look up sessions by scheduleUid
+        session_dict = {session["scheduleUid"]: session for session in sessions_data}
+
+        # Add the favorite flag to the corresponding sessions
+        for favorite_session in favorite_sessions:
+            schedule_uid = favorite_session["scheduleUid"]
+            if schedule_uid in session_dict:
+                session_dict[schedule_uid]["isFavorite"] = True
+
+        # Mark all other sessions as not favorite
+        for session in sessions_data:
+            if "isFavorite" not in session:
+                session["isFavorite"] = False
+
+    if sync_dir is not None:
+        with tracing.span("sync"):
+            changes = CatalogStore(sync_dir).sync(sessions_data)
+        logger.info(f"Catalog changes: {changes.summary()}")
+        if not changes:
+            logger.info(f"Catalog unchanged, leaving {output} as is")
+            if conditional:
+                save_validators(validators, output)
+            return
 
     # Sort sessions by Title
-    sessions = sorted(sessions_data, key=lambda d: d['title']) 
+    with tracing.span("sort"):
+        sessions = sorted(sessions_data, key=lambda d: d['title'])
 
     logger.info( "Saving sessions...")
-    with open("sessions.json", "w") as f:
-        f.write(json.dumps(sessions, indent=4))
+    with tracing.span("write", sessions=len(sessions)):
+        save_sessions(output, sessions)
+
+    if conditional:
+        save_validators(validators, output)
 
     logger.info( "Done!")
 
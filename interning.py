@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Dictionary encoding for columns that repeat a small set of values.
+
+A StringTable gives each distinct string a small integer code, in the order the
+strings are first seen. A DictColumn keeps one code per row in an int array and
+reads back as a sequence of strings, so code indexing table.venue[i] is unchanged
+while the column costs 4 bytes a row and every distinct value is stored once.
+"""
+from array import array
+from typing import Dict, Iterable, Iterator, List
+
+
+class StringTable:
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+        for value in values:
+            self.intern(value)
+
+    def intern(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, code: int) -> str:
+        return self.values[code]
+
+
+class DictColumn:
+    """A column of strings stored as codes into a (possibly shared) StringTable."""
+
+    __slots__ = ("strings", "codes")
+
+    def __init__(self, strings: StringTable):
+        self.strings = strings
+        self.codes = array('i')
+
+    def append(self, value: str) -> None:
+        self.codes.append(self.strings.intern(value))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, i: int) -> str:
+        return self.strings.values[self.codes[i]]
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self.strings.values.__getitem__, self.codes)
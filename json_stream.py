@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import codecs
+import json
+import os
+from typing import Any, Iterable, Iterator, Optional
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class _Buffer:
+    """
+    Text window over an iterable of byte chunks; consumed text is dropped as
+    parsing moves forward so only the current item is ever held in memory.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        if self.pos > 65536:
+            self.text = self.text[self.pos:]
+            self.pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self.text += self._utf8.decode(chunk)
+                return True
+        self.text += self._utf8.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def skip_whitespace(self) -> None:
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return
+
+    def peek(self) -> str:
+        self.skip_whitespace()
+        if self.pos >= len(self.text):
+            raise ValueError("Unexpected end of JSON stream")
+        return self.text[self.pos]
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at stream offset {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                # Most likely the value is cut off at the end of the buffer
+                if not self.fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.text) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_array_items(chunks: Iterable[bytes], key: str = "data") -> Iterator[Any]:
+    """
+    Yield the elements of the array stored under `key` in a top-level JSON object,
+    one at a time, while reading the document from `chunks`.
+    Other members of the object are parsed and discarded.
+    """
+    buf = _Buffer(chunks)
+    buf.expect("{")
+    if buf.peek() == "}":
+        return
+    while True:
+        name = buf.value()
+        buf.expect(":")
+        if name == key and buf.peek() == "[":
+            buf.expect("[")
+            if buf.peek() == "]":
+                buf.pos += 1
+            else:
+                while True:
+                    yield buf.value()
+                    if buf.peek() == "]":
+                        buf.pos += 1
+                        break
+                    buf.expect(",")
+        else:
+            buf.value()
+        if buf.peek() == "}":
+            return
+        buf.expect(",")
+
+
+def write_json_array(path: str, items: Iterable[Any], indent: Optional[int] = 4) -> int:
+    """
+    Write `items` to `path` as a JSON array, one item at a time, producing the same
+    text as json.dumps(list(items), indent=indent) (or the most compact separators
+    when indent is None). Returns the number of items.
+    The file is written under a temporary name and moved into place at the end.
+    """
+    count = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write("[")
+        if indent is None:
+            for item in items:
+                if count:
+                    f.write(",")
+                f.write(json.dumps(item, separators=(",", ":")))
+                count += 1
+            f.write("]")
+        else:
+            prefix = " " * indent
+            for item in items:
+                f.write(",\n" if count else "\n")
+                f.write(prefix)
+                f.write(json.dumps(item, indent=indent).replace("\n", "\n" + prefix))
+                count += 1
+            f.write("\n]" if count else "]")
+    os.replace(tmp_path, path)
+    return count
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+from array import array
+from datetime import datetime, timedelta, timezone
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import pytz
+
+from interning import DictColumn, StringTable
+
+LOCAL_TIMEZONE = pytz.timezone('America/Los_Angeles')
+EPOCH = datetime(1970, 1, 1)
+
+# Sentinel for a missing start/end time in the int64 time columns
+MISSING = -(2 ** 63)
+
+# Column order of the generated spreadsheet, as produced by display.py's original add_item
+# (kept in benchmarks/bench_normalize.py)
+ITEM_COLUMNS = (
+    "selected", "Favourite", "FavoriteAWS", "IsNew", "ID", "Title", "SessionLevel", "Description",
+    "Type", "TrackName", "Venue", "Day", "StartTime", "EndTime", "scheduleUid", "sessionUid", "Tags",
+)
+
+
+def localize_epochs(epochs: Iterable[int], tz=LOCAL_TIMEZONE) -> array:
+    """
+    Convert a column of UTC epoch seconds to local wall-clock seconds in one pass.
+
+    The UTC offset is looked up once per distinct UTC hour (DST changes happen on
+    the hour) instead of building a timezone-aware datetime for every value.
+    """
+    offsets: Dict[int, int] = {}
+    local = array('q')
+    for epoch in epochs:
+        if epoch == MISSING:
+            local.append(MISSING)
+            continue
+        hour = epoch // 3600
+        offset = offsets.get(hour)
+        if offset is None:
+            utc = datetime.fromtimestamp(hour * 3600, timezone.utc)
+            offset = int(utc.astimezone(tz).utcoffset().total_seconds())
+            offsets[hour] = offset
+        local.append(epoch + offset)
+    return local
+
+
+def local_datetime(seconds: int) -> Optional[datetime]:
+    """Naive local datetime for a value of a localized time column."""
+    if seconds == MISSING:
+        return None
+    return EPOCH + timedelta(seconds=seconds)
+
+
+def to_excel_date(seconds: int) -> Optional[str]:
+    if seconds == MISSING:
+        return None
+    return local_datetime(seconds).strftime('%x %X')
+
+
+class TagsColumn:
+    """
+    The Tags column as codes of "parent: name, " fragments, row i holding
+    codes[offsets[i]:offsets[i + 1]], joined into the displayed string when read.
+    """
+
+    __slots__ = ("strings", "codes", "offsets")
+
+    def __init__(self, strings: StringTable):
+        self.strings = strings
+        self.codes = array('i')
+        self.offsets = array('i', [0])
+
+    def append_codes(self, codes: Iterable[int]) -> None:
+        self.codes.extend(codes)
+        self.offsets.append(len(self.codes))
+
+    def row_codes(self, i: int) -> array:
+        return self.codes[self.offsets[i]:self.offsets[i + 1]]
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        values = self.strings.values
+        return "".join([values[code] for code in self.row_codes(i)])
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class SessionTable:
+    """
+    Normalised sessions stored column by column: one list (or typed array) per
+    spreadsheet column instead of one dict per session.
+    Times are kept as local wall-clock seconds since the epoch.
+
+    Venue, Day, TrackName and Type are dictionary-encoded against one shared
+    StringTable (`strings`), and Tags against a table of tag fragments, so each
+    distinct value is held once however many sessions repeat it.
+    """
+
+    def __init__(self):
+        self.selected: List = []
+        self.favourite: List = []
+        self.is_favorite_aws: List[bool] = []
+        self.is_new: List[bool] = []
+        self.third_party_id: List[str] = []
+        self.title: List[str] = []
+        self.session_level = array('b')
+        self.description: List[str] = []
+        self.strings = StringTable()
+        self.session_type = DictColumn(self.strings)
+        self.track_name = DictColumn(self.strings)
+        self.venue = DictColumn(self.strings)
+        self.day = DictColumn(self.strings)
+        self.start_time = array('q')
+        self.end_time = array('q')
+        self.schedule_uid: List[str] = []
+        self.session_uid: List[str] = []
+        self.tag_strings = StringTable()
+        self.tags = TagsColumn(self.tag_strings)
+
+    def __len__(self) -> int:
+        return len(self.third_party_id)
+
+    def row(self, i: int) -> tuple:
+        """One session as a tuple in ITEM_COLUMNS order."""
+        return (
+            self.selected[i],
+            self.favourite[i],
+            self.is_favorite_aws[i],
+            self.is_new[i],
+            self.third_party_id[i],
+            self.title[i],
+            self.session_level[i],
+            self.description[i],
+            self.session_type[i],
+            self.track_name[i],
+            self.venue[i],
+            self.day[i],
+            to_excel_date(self.start_time[i]),
+            to_excel_date(self.end_time[i]),
+            self.schedule_uid[i],
+            self.session_uid[i],
+            self.tags[i],
+        )
+
+    def rows(self, columns: Sequence[str] = ITEM_COLUMNS) -> Iterator[tuple]:
+        """Rows as tuples holding `columns` (names from ITEM_COLUMNS) in that order."""
+        if tuple(columns) == ITEM_COLUMNS:
+            for i in range(len(self)):
+                yield self.row(i)
+            return
+        pick = itemgetter(*(ITEM_COLUMNS.index(c) for c in columns))
+        for i in range(len(self)):
+            yield pick(self.row(i))
+
+    def items(self) -> Iterator[Dict]:
+        """Rows as the dicts the original add_item built."""
+        for row in self.rows():
+            yield dict(zip(ITEM_COLUMNS, row))
+
+
+def normalize_sessions(sessions: Iterable[Dict], favourites: Dict, is_selected_data: Dict) -> SessionTable:
+    """
+    Batched equivalent of display.py's original parse_sessions (kept in
+    benchmarks/bench_normalize.py) that leaves `sessions` untouched and returns a SessionTable.
+    """
+    table = SessionTable()
+    start_epochs = array('q')
+    end_epochs = array('q')
+    # (parent, name) -> code of its "parent: name, " fragment, built once per distinct tag
+    tag_codes: Dict[tuple, int] = {}
+
+    for session in sessions:
+        third_party_id = session['thirdPartyID']
+        table.third_party_id.append(third_party_id)
+        table.favourite.append(favourites.get(third_party_id.split("-")[0], ""))
+        table.selected.append(is_selected_data.get(third_party_id, ""))
+        table.is_new.append(third_party_id not in is_selected_data)
+        table.is_favorite_aws.append(session['isFavorite'])
+        table.title.append(session['title'])
+        table.session_level.append(int(third_party_id[3]) if len(third_party_id) >= 4 else 0)
+        table.description.append(session['description'])
+        table.session_type.append(session['sessionType'])
+        table.track_name.append(session['trackName'])
+        table.schedule_uid.append(session['scheduleUid'])
+        table.session_uid.append(session['sessionUid'])
+
+        start = session['startDateTime']
+        end = session['endDateTime']
+        start_epochs.append(MISSING if start == "" else int(start))
+        end_epochs.append(MISSING if end == "" else int(end))
+
+        # One pass over the tags picks out Venue and Day and encodes the Tags column
+        venue = ""
+        day = ""
+        codes = []
+        for tag in session['tags']:
+            parent = tag['parentTagName']
+            name = tag['tagName']
+            if parent == "Venue":
+                venue = name
+            elif parent == "Day":
+                day = name
+            code = tag_codes.get((parent, name))
+            if code is None:
+                code = tag_codes[(parent, name)] = table.tag_strings.intern(
+                    parent.replace(" ", "_").lower() + ": " + name + ", "
+                )
+            codes.append(code)
+        table.venue.append(venue)
+        table.day.append(day)
+        table.tags.append_codes(codes)
+
+    table.start_time = localize_epochs(start_epochs)
+    table.end_time = localize_epochs(end_epochs)
+    return table
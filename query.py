@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+import catalog_db
+from catalog_storage import load_sessions, save_sessions
+from search_index import SearchIndex
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Query the session catalog without going through Excel.  Run 'build' after each download to load sessions.json into an indexed SQLite database, then 'find' sessions in it.")
+    parser.add_argument("--db", default="catalog.sqlite", help="Path to the catalog database (default: catalog.sqlite)")
+    parser.add_argument("--index", default="search_index.sqlite", help="Path to the full-text search index (default: search_index.sqlite)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Load a downloaded catalog into the database")
+    build.add_argument("sessions", nargs='?', default="sessions.json", help="Catalog written by download.py (default: sessions.json)")
+
+    find = subparsers.add_parser("find", help="Find sessions, e.g. find --level 300 --venue Venetian --day Tuesday --from 1pm --to 3pm")
+    find.add_argument("--venue", help="Venue name or its beginning, e.g. Venetian")
+    find.add_argument("--day", help="Day name or its beginning, e.g. Tuesday or tue")
+    find.add_argument("--level", type=int, help="Session level, e.g. 300")
+    find.add_argument("--track", help="Track name or its beginning")
+    find.add_argument("--type", dest="session_type", help="Session type or its beginning, e.g. Workshop")
+    find.add_argument("--tag", dest="tags", action="append", default=[], help="Tag name or its beginning; repeat to require several tags")
+    find.add_argument("--title", help="Text contained in the title")
+    find.add_argument("--from", dest="starts_after", type=catalog_db.parse_time_of_day, help="Starts at or after this local time, e.g. 13:00 or 1pm")
+    find.add_argument("--to", dest="ends_before", type=catalog_db.parse_time_of_day, help="Ends at or before this local time, e.g. 15:00 or 3pm")
+    find.add_argument("--format", choices=["table", "json", "ids"], default="table", help="Output format (default: table)")
+
+    index = subparsers.add_parser("index", help="Update the full-text search index from a downloaded catalog (only changed sessions are re-indexed)")
+    index.add_argument("sessions", nargs='?', default="sessions.json", help="Catalog written by download.py (default: sessions.json)")
+
+    search = subparsers.add_parser("search", help="Full-text search over titles, descriptions and tags, best match first")
+    search.add_argument("query", nargs='+', help="Search terms")
+    search.add_argument("--limit", type=int, default=20, help="Maximum number of results (default: 20)")
+    search.add_argument("--format", choices=["table", "ids"], default="table", help="Output format (default: table)")
+    return parser.parse_args()
+
+
+def format_minute(minute):
+    if minute is None:
+        return "--:--"
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def print_rows(rows, output_format):
+    if output_format == "ids":
+        for row in rows:
+            print(row["thirdPartyID"])
+    elif output_format == "json":
+        print(json.dumps([dict(row) for row in rows], indent=4))
+    else:
+        for row in rows:
+            print(f"{row['thirdPartyID']:<12} {row['day']:<10} {format_minute(row['startMinute'])}-{format_minute(row['endMinute'])} {row['venue']:<14} {row['title']}")
+        print(f"{len(rows)} sessions")
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    if args.command == "build":
+        count = save_sessions(args.db, load_sessions(args.sessions))
+        print(f"Loaded {count} sessions into {args.db}")
+        sys.exit(0)
+
+    if args.command == "index":
+        with SearchIndex(args.index) as search_index:
+            added, updated, removed = search_index.update(load_sessions(args.sessions))
+        print(f"Search index updated: {added} added, {updated} updated, {removed} removed")
+        sys.exit(0)
+
+    if args.command == "search":
+        if not os.path.exists(args.index):
+            sys.exit(f"{args.index} does not exist, run 'query.py index' first")
+        with SearchIndex(args.index) as search_index:
+            results = search_index.search(" ".join(args.query), args.limit)
+        for third_party_id, score, title in results:
+            if args.format == "ids":
+                print(third_party_id)
+            else:
+                print(f"{third_party_id:<12} {score:6.2f}  {title}")
+        sys.exit(0)
+
+    if not os.path.exists(args.db):
+        sys.exit(f"{args.db} does not exist, run 'query.py build' first")
+
+    conn = sqlite3.connect(args.db)
+    rows = catalog_db.find_sessions(
+        conn,
+        venue=args.venue,
+        day=args.day,
+        level=args.level,
+        track=args.track,
+        session_type=args.session_type,
+        starts_after=args.starts_after,
+        ends_before=args.ends_before,
+        tags=args.tags,
+        title=args.title,
+    )
+    print_rows(rows, args.format)
+    conn.close()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+
+
+class RateLimiter:
+    """
+    Thread-safe per-host rate limit: requests to the same host are spaced at least
+    1 / rate seconds apart, whichever thread sends them.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot: Dict[str, float] = {}
+
+    def acquire(self, host: str) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter that waits for a RateLimiter slot before sending each request."""
+
+    def __init__(self, limiter: RateLimiter, *args, **kwargs):
+        self.limiter = limiter
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, *args, **kwargs):
+        self.limiter.acquire(urlparse(request.url).netloc)
+        return super().send(request, *args, **kwargs)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+import hashlib
+import heapq
+import math
+import re
+import sqlite3
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# A term in the title counts as much as three in the description
+FIELD_WEIGHTS = {"title": 3.0, "tags": 2.0, "description": 1.0}
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in into is it of on or that the this to "
+    "we what when with you your".split()
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    doc INTEGER PRIMARY KEY,
+    scheduleUid TEXT NOT NULL UNIQUE,
+    thirdPartyID TEXT,
+    title TEXT,
+    hash TEXT NOT NULL,
+    length REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc INTEGER NOT NULL,
+    tf REAL NOT NULL,
+    PRIMARY KEY (term, doc)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings (doc);
+"""
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS]
+
+
+def document_fields(session: Dict) -> Dict[str, str]:
+    return {
+        "title": session.get("title") or "",
+        "description": session.get("description") or "",
+        "tags": " ".join(t["tagName"] for t in session.get("tags", [])),
+    }
+
+
+def document_terms(session: Dict) -> Counter:
+    """Weighted term frequencies of a session across its indexed fields."""
+    terms: Counter = Counter()
+    for field, text in document_fields(session).items():
+        weight = FIELD_WEIGHTS[field]
+        for term in tokenize(text):
+            terms[term] += weight
+    return terms
+
+
+def document_hash(session: Dict) -> str:
+    fields = document_fields(session)
+    key = "\0".join([session.get("thirdPartyID", ""), fields["title"], fields["description"], fields["tags"]])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class SearchIndex:
+    """
+    Inverted index over session titles, descriptions and tag names, ranked with BM25.
+
+    Postings live in SQLite so a search only reads the rows for the query terms,
+    and `update` only re-tokenises sessions whose indexed text changed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "SearchIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def update(self, sessions: Iterable[Dict]) -> Tuple[int, int, int]:
+        """
+        Bring the index in line with `sessions`.
+        Returns the number of sessions (added, updated, removed).
+        """
+        conn = self.conn
+        existing = {
+            uid: (doc, h) for doc, uid, h in conn.execute("SELECT doc, scheduleUid, hash FROM docs")
+        }
+        seen = set()
+        added = updated = 0
+        with conn:
+            for session in sessions:
+                uid = session["scheduleUid"]
+                seen.add(uid)
+                new_hash = document_hash(session)
+                old = existing.get(uid)
+                if old is not None:
+                    if old[1] == new_hash:
+                        continue
+                    self._delete(old[0])
+                    updated += 1
+                else:
+                    added += 1
+                terms = document_terms(session)
+                cursor = conn.execute(
+                    "INSERT INTO docs (scheduleUid, thirdPartyID, title, hash, length) VALUES (?, ?, ?, ?, ?)",
+                    (uid, session.get("thirdPartyID"), session.get("title"), new_hash, sum(terms.values())),
+                )
+                doc = cursor.lastrowid
+                conn.executemany(
+                    "INSERT INTO postings VALUES (?, ?, ?)",
+                    ((term, doc, tf) for term, tf in terms.items()),
+                )
+            removed = [doc for uid, (doc, _) in existing.items() if uid not in seen]
+            for doc in removed:
+                self._delete(doc)
+        return added, updated, len(removed)
+
+    def _delete(self, doc: int) -> None:
+        self.conn.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+        self.conn.execute("DELETE FROM docs WHERE doc = ?", (doc,))
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float, str]]:
+        """
+        Return up to `limit` (thirdPartyID, score, title) tuples, best match first.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        conn = self.conn
+        total_docs, avg_length = conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+        if not total_docs:
+            return []
+
+        scores: Dict[int, float] = {}
+        for term in terms:
+            rows = conn.execute(
+                "SELECT p.doc, p.tf, d.length FROM postings p JOIN docs d ON d.doc = p.doc WHERE p.term = ?",
+                (term,),
+            ).fetchall()
+            if not rows:
+                continue
+            idf = math.log(1 + (total_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            for doc, tf, length in rows:
+                norm = tf + K1 * (1 - B + B * length / avg_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (K1 + 1) / norm
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        results = []
+        for doc, score in best:
+            third_party_id, title = conn.execute(
+                "SELECT thirdPartyID, title FROM docs WHERE doc = ?", (doc,)
+            ).fetchone()
+            results.append((third_party_id, score, title))
+        return results
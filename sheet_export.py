@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Workbook export with extra worksheets per track, day, venue and session type.
+
+Every group is a list of row numbers into one SessionTable. Each row is
+rendered to its worksheet XML once, by a pool of worker processes, and the same
+bytes are reused by every sheet the row appears in. The dictionary-encoded
+Venue, Day, TrackName and Type columns are written as shared strings, straight
+from the table's string table.
+
+update_workbook re-exports incrementally: a row map kept next to the workbook
+records the scheduleUid and content hash of every row and which rows each sheet
+holds (scheduleUid rather than ID, which a catalog can repeat).
+Only changed rows are rendered, unchanged rows are taken from the previous ALL
+sheet, and sheets whose rows are all unchanged are copied without rendering them again.
+"""
+import hashlib
+import json
+import os
+import zipfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import xlsx_parts
+from interning import StringTable
+from normalize import ITEM_COLUMNS, SessionTable
+
+# --split name -> (SessionTable column, worksheet name prefix)
+GROUPINGS = {
+    "track": ("track_name", "Track"),
+    "day": ("day", "Day"),
+    "venue": ("venue", "Venue"),
+    "type": ("session_type", "Type"),
+}
+
+# Spreadsheet columns written as shared strings -> their dictionary-encoded SessionTable column
+SHARED_COLUMNS = {
+    "Type": "session_type",
+    "TrackName": "track_name",
+    "Venue": "venue",
+    "Day": "day",
+}
+
+# Rows rendered per task sent to the worker pool
+CHUNK_SIZE = 2000
+
+ROW_MAP_VERSION = 2
+
+# Set in each worker by _init_worker
+_table: Optional[SessionTable] = None
+_column_indexes: Sequence[int] = ()
+_favourite_index = 0
+_shared: List[Tuple[int, object]] = []
+_shared_indexes: Optional[Sequence[int]] = None
+
+
+def group_rows(table: SessionTable, groupings: Sequence[str]) -> Dict[str, array]:
+    """
+    Assign every row to its group in each requested grouping, by the grouped column's codes.
+    Returns {worksheet name: row numbers}, with "ALL" first and the groups of each
+    grouping sorted by name. Rows with an empty value are left out of that grouping.
+    """
+    sheets = {"ALL": array('i', range(len(table)))}
+    for grouping in groupings:
+        attribute, prefix = GROUPINGS[grouping]
+        column = getattr(table, attribute)
+        by_code: Dict[int, array] = {}
+        for i, code in enumerate(column.codes):
+            rows = by_code.get(code)
+            if rows is None:
+                rows = by_code[code] = array('i')
+            rows.append(i)
+        group = {column.strings[code]: rows for code, rows in by_code.items()}
+        for value in sorted(group):
+            if value:
+                sheets[f"{prefix} {value}"] = group[value]
+    return sheets
+
+
+def _init_worker(
+    table: SessionTable,
+    column_indexes: Sequence[int],
+    favourite_index: int,
+    shared_indexes: Optional[Sequence[int]] = None,
+) -> None:
+    """
+    `shared_indexes` maps the codes of table.strings to positions in the workbook's
+    shared strings; None when the workbook uses table.strings as it is.
+    """
+    global _table, _column_indexes, _favourite_index, _shared, _shared_indexes
+    _table = table
+    _column_indexes = column_indexes
+    _favourite_index = favourite_index
+    _shared = [
+        (position, getattr(table, SHARED_COLUMNS[ITEM_COLUMNS[c]]))
+        for position, c in enumerate(column_indexes)
+        if ITEM_COLUMNS[c] in SHARED_COLUMNS
+    ]
+    _shared_indexes = shared_indexes
+
+
+def _render_row(i: int) -> bytes:
+    full = _table.row(i)
+    favourite = full[_favourite_index]
+    blank = favourite is None or (isinstance(favourite, str) and favourite.strip() == "")
+    style = xlsx_parts.STYLE_CELL if blank else xlsx_parts.STYLE_FAVOURITE
+    values = [full[c] for c in _column_indexes]
+    for position, column in _shared:
+        # Empty values stay empty cells
+        if values[position]:
+            code = column.codes[i]
+            values[position] = xlsx_parts.SharedString(code if _shared_indexes is None else _shared_indexes[code])
+    return xlsx_parts.row_xml(values, style)
+
+
+def _render_chunk(bounds: Tuple[int, int]) -> List[bytes]:
+    start, stop = bounds
+    return [_render_row(i) for i in range(start, stop)]
+
+
+def _worker_args(
+    table: SessionTable, column_names: Sequence[str], shared_indexes: Optional[Sequence[int]] = None
+) -> tuple:
+    return (
+        table,
+        [ITEM_COLUMNS.index(c) for c in column_names],
+        ITEM_COLUMNS.index("Favourite"),
+        shared_indexes,
+    )
+
+
+def render_rows(table: SessionTable, column_names: Sequence[str], workers: Optional[int] = None) -> List[bytes]:
+    """
+    Render every row of `table` (the given columns, in order) to worksheet XML,
+    spread across `workers` processes (all CPUs by default, 1 renders in-process).
+    Shared string cells refer to table.strings.
+    """
+    init_args = _worker_args(table, column_names)
+    chunks = [(start, min(start + CHUNK_SIZE, len(table))) for start in range(0, len(table), CHUNK_SIZE)]
+    workers = workers or os.cpu_count() or 1
+    fragments: List[bytes] = []
+    if workers == 1 or len(chunks) <= 1:
+        _init_worker(*init_args)
+        for chunk in chunks:
+            fragments.extend(_render_chunk(chunk))
+        return fragments
+
+    # Workers get the table once, at start-up (inherited for free where processes are forked)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+        for rendered in pool.map(_render_chunk, chunks):
+            fragments.extend(rendered)
+    return fragments
+
+
+def export_workbook(
+    path: str,
+    table: SessionTable,
+    columns: Sequence[Tuple[str, float]],
+    groupings: Sequence[str] = (),
+    workers: Optional[int] = None,
+    extra_sheets: Sequence[Tuple[str, Sequence[Tuple[str, float]], Iterable[tuple]]] = (),
+) -> Dict[str, int]:
+    """
+    Write `table` to `path` with an ALL sheet plus one sheet per group of each grouping
+    ("track", "day", "venue", "type"), followed by any (name, columns, rows) extra sheets.
+    Returns the number of session rows on each sheet.
+    """
+    sheets = group_rows(table, groupings)
+    fragments = render_rows(table, [name for name, _ in columns], workers)
+    xlsx_parts.write_workbook(
+        path,
+        [(name, columns, (fragments[i] for i in rows)) for name, rows in sheets.items()]
+        + [
+            (name, extra_columns, (xlsx_parts.row_xml(row) for row in rows))
+            for name, extra_columns, rows in extra_sheets
+        ],
+        shared_strings=table.strings.values,
+    )
+    return {name: len(rows) for name, rows in sheets.items()}
+
+
+def row_map_path(path: str) -> str:
+    return path + ".row-map.json"
+
+
+def row_hashes(table: SessionTable) -> List[str]:
+    """A hash of every column of each row, raw times included, in table order."""
+    columns = zip(
+        table.selected, table.favourite, table.is_favorite_aws, table.is_new, table.third_party_id,
+        table.title, table.session_level, table.description, table.session_type, table.track_name,
+        table.venue, table.day, table.start_time, table.end_time, table.schedule_uid,
+        table.session_uid, table.tags,
+    )
+    return [hashlib.blake2b(repr(row).encode("utf-8"), digest_size=8).hexdigest() for row in columns]
+
+
+def load_row_map(path: str, columns: Sequence[Tuple[str, float]]) -> Optional[Dict]:
+    """
+    The row map saved by the export that wrote the workbook at `path`, or None when
+    there is none, or the workbook was changed since or written with other columns.
+    """
+    map_path = row_map_path(path)
+    if not os.path.exists(path) or not os.path.exists(map_path):
+        return None
+    with open(map_path, "r") as f:
+        row_map = json.load(f)
+    stat = os.stat(path)
+    if (
+        row_map.get("version") != ROW_MAP_VERSION
+        or row_map["mtime"] != stat.st_mtime
+        or row_map["size"] != stat.st_size
+        or row_map["columns"] != [list(column) for column in columns]
+    ):
+        return None
+    return row_map
+
+
+def save_row_map(
+    path: str,
+    columns: Sequence[Tuple[str, float]],
+    keys: Sequence[str],
+    hashes: Sequence[str],
+    sheets: Dict[str, array],
+    extra_names: Sequence[str],
+    strings: Sequence[str],
+) -> None:
+    stat = os.stat(path)
+    row_map = {
+        "version": ROW_MAP_VERSION,
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "columns": [list(column) for column in columns],
+        # scheduleUid -> row is keys.index(scheduleUid); sheet rows are positions in keys
+        "keys": list(keys),
+        "hashes": list(hashes),
+        "sheets": [[name, rows.tolist()] for name, rows in sheets.items()],
+        "extra_sheets": list(extra_names),
+        # The workbook's shared strings, which rows reused from it refer to
+        "strings": list(strings),
+    }
+    # dumps() goes through the C encoder, dump() would encode piecewise in Python
+    with open(row_map_path(path), "w") as f:
+        f.write(json.dumps(row_map, separators=(",", ":")))
+
+
+def update_workbook(
+    path: str,
+    table: SessionTable,
+    columns: Sequence[Tuple[str, float]],
+    groupings: Sequence[str] = (),
+    workers: Optional[int] = None,
+    extra_sheets: Sequence[Tuple[str, Sequence[Tuple[str, float]], Iterable[tuple]]] = (),
+) -> Dict[str, int]:
+    """
+    Like export_workbook, but reuse what it can of the workbook already at `path`.
+    Falls back to a full export when the row map is missing or stale, or scheduleUids repeat.
+    Returns the number of session rows on each sheet.
+    """
+    keys = table.schedule_uid
+    hashes = row_hashes(table)
+    sheets = group_rows(table, groupings)
+    row_map = load_row_map(path, columns)
+    if row_map is None or len(set(keys)) != len(keys):
+        counts = export_workbook(path, table, columns, groupings, workers, extra_sheets)
+        save_row_map(path, columns, keys, hashes, sheets, [name for name, _, _ in extra_sheets], table.strings.values)
+        return counts
+
+    old_keys = row_map["keys"]
+    old_rows = {key: i for i, key in enumerate(old_keys)}
+    old_hashes = row_map["hashes"]
+    changed = [
+        i for i, (key, row_hash) in enumerate(zip(keys, hashes))
+        if key not in old_rows or old_hashes[old_rows[key]] != row_hash
+    ]
+    changed_set = set(changed)
+    old_sheets = {
+        name: (n, [old_keys[i] for i in rows]) for n, (name, rows) in enumerate(row_map["sheets"], start=1)
+    }
+
+    def unchanged(name: str, rows: array) -> bool:
+        old = old_sheets.get(name)
+        return (
+            old is not None
+            and len(old[1]) == len(rows)
+            and not changed_set.intersection(rows)
+            and all(keys[i] == key for i, key in zip(rows, old[1]))
+        )
+
+    reused = {name: unchanged(name, rows) for name, rows in sheets.items()}
+    if all(reused.values()) and len(sheets) == len(old_sheets) and not extra_sheets and not row_map["extra_sheets"]:
+        return {name: len(rows) for name, rows in sheets.items()}
+
+    # Strings new to this export are added after the ones reused rows refer to
+    shared = StringTable(row_map["strings"])
+    shared_indexes = [shared.intern(value) for value in table.strings.values]
+    _init_worker(*_worker_args(table, [name for name, _ in columns], shared_indexes))
+    fragments: List[Optional[bytes]] = [None] * len(table)
+    for i in changed:
+        fragments[i] = _render_row(i)
+
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(path) as previous:
+        if not all(reused.values()):
+            # The previous ALL sheet holds every row of the previous export
+            old_fragments = xlsx_parts.read_rows(previous, xlsx_parts.sheet_part(old_sheets["ALL"][0]))
+            for i, key in enumerate(keys):
+                if fragments[i] is None:
+                    fragments[i] = old_fragments[old_rows[key]]
+            del old_fragments
+        parts = []
+        for name, rows in sheets.items():
+            if reused[name]:
+                parts.append((name, columns, xlsx_parts.PreviousPart(xlsx_parts.sheet_part(old_sheets[name][0]))))
+            else:
+                parts.append((name, columns, (fragments[i] for i in rows)))
+        xlsx_parts.write_workbook(
+            tmp_path,
+            parts
+            + [
+                (name, extra_columns, (xlsx_parts.row_xml(row) for row in rows))
+                for name, extra_columns, rows in extra_sheets
+            ],
+            previous,
+            shared.values,
+        )
+    os.replace(tmp_path, path)
+    save_row_map(path, columns, keys, hashes, sheets, [name for name, _, _ in extra_sheets], shared.values)
+    return {name: len(rows) for name, rows in sheets.items()}
@@ -5,23 +5,13 @@ import hashlib
 import hmac
 import re
 
-import boto3
 import os
-import six
 
+from .constants import BIG_N, G, G_HEX, INFO_BITS, K, N_HEX, hash_to_int, int_to_padded_bytes, mod_pow
 from .exceptions import ForceChangePasswordException
 
-# https://github.com/aws/amazon-cognito-identity-js/blob/master/src/AuthenticationHelper.js#L22
-n_hex = 'FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD1' + '29024E088A67CC74020BBEA63B139B22514A08798E3404DD' + \
-        'EF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245' + 'E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED' + \
-        'EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3D' + 'C2007CB8A163BF0598DA48361C55D39A69163FA8FD24CF5F' + \
-        '83655D23DCA3AD961C62F356208552BB9ED529077096966D' + '670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B' + \
-        'E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9' + 'DE2BCBF6955817183995497CEA956AE515D2261898FA0510' + \
-        '15728E5A8AAAC42DAD33170D04507A33A85521ABDF1CBA64' + 'ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7' + \
-        'ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6B' + 'F12FFA06D98A0864D87602733EC86A64521F2B18177B200C' + \
-        'BBE117577A615D6C770988C0BAD946E208E24FA074E5AB31' + '43DB5BFCE0FD108E4B82D120A93AD2CAFFFFFFFFFFFFFFFF'
-# https://github.com/aws/amazon-cognito-identity-js/blob/master/src/AuthenticationHelper.js#L49
-g_hex = '2'
+n_hex = N_HEX
+g_hex = G_HEX
 info_bits = bytearray('Caldera Derived Key', 'utf-8')
 
 
@@ -54,7 +44,7 @@ def pad_hex(long_int):
     :param {Long integer|String} long_int Number or string to pad.
     :return {String} Padded hex string.
     """
-    if not isinstance(long_int, six.string_types):
+    if not isinstance(long_int, str):
         hash_str = long_to_hex(long_int)
     else:
         hash_str = long_int
@@ -74,8 +64,7 @@ def compute_hkdf(ikm, salt):
     @private
     """
     prk = hmac.new(salt, ikm, hashlib.sha256).digest()
-    info_bits_update = info_bits + bytearray(chr(1), 'utf-8')
-    hmac_hash = hmac.new(prk, info_bits_update, hashlib.sha256).digest()
+    hmac_hash = hmac.new(prk, INFO_BITS, hashlib.sha256).digest()
     return hmac_hash[:16]
 
 
@@ -86,8 +75,7 @@ def calculate_u(big_a, big_b):
     :param {Long integer} big_b Server B value.
     :return {Long integer} Computed U value.
     """
-    u_hex_hash = hex_hash(pad_hex(big_a) + pad_hex(big_b))
-    return hex_to_long(u_hex_hash)
+    return hash_to_int(int_to_padded_bytes(big_a) + int_to_padded_bytes(big_b))
 
 
 class AWSSRP(object):
@@ -96,7 +84,7 @@ class AWSSRP(object):
     PASSWORD_VERIFIER_CHALLENGE = 'PASSWORD_VERIFIER'
 
     def __init__(self, username, password, pool_id, client_id, pool_region=None,
-                 client=None, client_secret=None):
+                 client=None, client_secret=None, retry=None, ephemeral_pool=None):
         if pool_region is not None and client is not None:
             raise ValueError("pool_region and client should not both be specified "
                              "(region should be passed to the boto3 client instead)")
@@ -106,12 +94,21 @@ class AWSSRP(object):
         self.pool_id = pool_id
         self.client_id = client_id
         self.client_secret = client_secret
-        self.client = client if client else boto3.client('cognito-idp', region_name=pool_region)
-        self.big_n = hex_to_long(n_hex)
-        self.g = hex_to_long(g_hex)
-        self.k = hex_to_long(hex_hash('00' + n_hex + '0' + g_hex))
-        self.small_a_value = self.generate_random_small_a()
-        self.large_a_value = self.calculate_a()
+        # Optional retry(method, **kwargs) wrapper around every Cognito call
+        self.retry = retry
+        if client is None:
+            # boto3 is only imported when no client is passed in, it is slow to load
+            import boto3
+            client = boto3.client('cognito-idp', region_name=pool_region)
+        self.client = client
+        self.big_n = BIG_N
+        self.g = G
+        self.k = K
+        if ephemeral_pool is not None:
+            self.small_a_value, self.large_a_value = ephemeral_pool.take()
+        else:
+            self.small_a_value = self.generate_random_small_a()
+            self.large_a_value = self.calculate_a()
 
     def generate_random_small_a(self):
         """
@@ -128,7 +125,7 @@ class AWSSRP(object):
         :param {Long integer} a Randomly generated small A.
         :return {Long integer} Computed large A.
         """
-        big_a = pow(self.g, self.small_a_value, self.big_n)
+        big_a = mod_pow(self.g, self.small_a_value, self.big_n)
         # safety check
         if (big_a % self.big_n) == 0:
             raise ValueError('Safety check for A failed')
@@ -147,14 +144,14 @@ class AWSSRP(object):
         if u_value == 0:
             raise ValueError('U cannot be zero.')
         username_password = '%s%s:%s' % (self.pool_id.split('_')[1], username, password)
-        username_password_hash = hash_sha256(username_password.encode('utf-8'))
+        username_password_hash = hashlib.sha256(username_password.encode('utf-8')).digest()
 
-        x_value = hex_to_long(hex_hash(pad_hex(salt) + username_password_hash))
-        g_mod_pow_xn = pow(self.g, x_value, self.big_n)
+        # The salt is kept as the server sent it (leading zeros included), hence pad_hex
+        x_value = hash_to_int(bytes.fromhex(pad_hex(salt)) + username_password_hash)
+        g_mod_pow_xn = mod_pow(self.g, x_value, self.big_n)
         int_value2 = server_b_value - self.k * g_mod_pow_xn
-        s_value = pow(int_value2, self.small_a_value + u_value * x_value, self.big_n)
-        hkdf = compute_hkdf(bytearray.fromhex(pad_hex(s_value)),
-                            bytearray.fromhex(pad_hex(long_to_hex(u_value))))
+        s_value = mod_pow(int_value2, self.small_a_value + u_value * x_value, self.big_n)
+        hkdf = compute_hkdf(int_to_padded_bytes(s_value), int_to_padded_bytes(u_value))
         return hkdf
 
     def get_auth_params(self):
@@ -197,17 +194,24 @@ class AWSSRP(object):
                 self.get_secret_hash(self.username, self.client_id, self.client_secret)})
         return response
 
+    def _call(self, method, **kwargs):
+        if self.retry is None:
+            return method(**kwargs)
+        return self.retry(method, **kwargs)
+
     def authenticate_user(self, client=None):
         boto_client = self.client or client
         auth_params = self.get_auth_params()
-        response = boto_client.initiate_auth(
+        response = self._call(
+            boto_client.initiate_auth,
             AuthFlow='USER_SRP_AUTH',
             AuthParameters=auth_params,
             ClientId=self.client_id
         )
         if response['ChallengeName'] == self.PASSWORD_VERIFIER_CHALLENGE:
             challenge_response = self.process_challenge(response['ChallengeParameters'])
-            tokens = boto_client.respond_to_auth_challenge(
+            tokens = self._call(
+                boto_client.respond_to_auth_challenge,
                 ClientId=self.client_id,
                 ChallengeName=self.PASSWORD_VERIFIER_CHALLENGE,
                 ChallengeResponses=challenge_response)
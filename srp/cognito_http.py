@@ -0,0 +1,67 @@
+"""
+Minimal Cognito Identity Provider client for the two calls a login needs.
+
+InitiateAuth and RespondToAuthChallenge are public Cognito APIs: they are plain
+JSON POSTs identified by an X-Amz-Target header and need no AWS credentials or
+request signing. Talking to them directly avoids importing boto3/botocore, which
+costs more start-up time and memory than the whole rest of download.py.
+"""
+import requests
+
+TARGET_PREFIX = 'AWSCognitoIdentityProviderService.'
+CONTENT_TYPE = 'application/x-amz-json-1.1'
+
+
+class CognitoError(Exception):
+    """
+    Error answer from Cognito. Like botocore's ClientError, the error code is in
+    response['Error']['Code'], so callers can handle both the same way.
+    """
+
+    def __init__(self, operation, code, message, status_code=None):
+        super(CognitoError, self).__init__(
+            'An error occurred (%s) when calling the %s operation: %s' % (code, operation, message))
+        self.operation_name = operation
+        self.response = {
+            'Error': {'Code': code, 'Message': message},
+            'ResponseMetadata': {'HTTPStatusCode': status_code},
+        }
+
+
+def _error_code(response, body):
+    # "aws.cognito#NotAuthorizedException" or "NotAuthorizedException:http://..."
+    code = response.headers.get('x-amzn-ErrorType') or body.get('__type') or ''
+    code = code.split(':')[0].split('#')[-1]
+    if not code:
+        code = 'InternalErrorException' if response.status_code >= 500 else 'UnknownError'
+    return code
+
+
+class CognitoHttpClient(object):
+
+    def __init__(self, region_name='us-east-1', endpoint_url=None, session=None, timeout=30):
+        self.endpoint_url = endpoint_url or 'https://cognito-idp.%s.amazonaws.com/' % region_name
+        self.session = session or requests.Session()
+        self.timeout = timeout
+
+    def _call(self, operation, params):
+        response = self.session.post(
+            self.endpoint_url,
+            json=params,
+            headers={'Content-Type': CONTENT_TYPE, 'X-Amz-Target': TARGET_PREFIX + operation},
+            timeout=self.timeout,
+        )
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if response.status_code != 200:
+            message = body.get('message') or body.get('Message') or response.text[:200]
+            raise CognitoError(operation, _error_code(response, body), message, response.status_code)
+        return body
+
+    def initiate_auth(self, **params):
+        return self._call('InitiateAuth', params)
+
+    def respond_to_auth_challenge(self, **params):
+        return self._call('RespondToAuthChallenge', params)
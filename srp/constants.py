@@ -0,0 +1,62 @@
+"""
+SRP group parameters, computed once at import, and byte-oriented helpers.
+
+The helpers produce the same values as pad_hex/hex_hash/hex_to_long in
+aws_srp.py, but work on ints and bytes directly instead of formatting every
+3072-bit number as hex and parsing it back.
+"""
+import hashlib
+
+try:
+    # gmpy2 (optional) does the 3072-bit exponentiations several times faster than pow()
+    from gmpy2 import powmod as _powmod
+except ImportError:
+    _powmod = None
+
+# https://github.com/aws/amazon-cognito-identity-js/blob/master/src/AuthenticationHelper.js#L22
+N_HEX = 'FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD1' + '29024E088A67CC74020BBEA63B139B22514A08798E3404DD' + \
+        'EF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245' + 'E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED' + \
+        'EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3D' + 'C2007CB8A163BF0598DA48361C55D39A69163FA8FD24CF5F' + \
+        '83655D23DCA3AD961C62F356208552BB9ED529077096966D' + '670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B' + \
+        'E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9' + 'DE2BCBF6955817183995497CEA956AE515D2261898FA0510' + \
+        '15728E5A8AAAC42DAD33170D04507A33A85521ABDF1CBA64' + 'ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7' + \
+        'ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6B' + 'F12FFA06D98A0864D87602733EC86A64521F2B18177B200C' + \
+        'BBE117577A615D6C770988C0BAD946E208E24FA074E5AB31' + '43DB5BFCE0FD108E4B82D120A93AD2CAFFFFFFFFFFFFFFFF'
+# https://github.com/aws/amazon-cognito-identity-js/blob/master/src/AuthenticationHelper.js#L49
+G_HEX = '2'
+
+BIG_N = int(N_HEX, 16)
+G = int(G_HEX, 16)
+# k = H(00 | N | 0 | g), hashed exactly as AuthenticationHelper does
+K = int(hashlib.sha256(bytes.fromhex('00' + N_HEX + '0' + G_HEX)).hexdigest(), 16)
+
+INFO_BITS = bytearray('Caldera Derived Key', 'utf-8') + bytearray(chr(1), 'utf-8')
+
+
+def int_to_padded_bytes(value):
+    """
+    Big-endian bytes of a non-negative int with a leading zero byte when the top
+    bit is set, i.e. bytes.fromhex(pad_hex(value)).
+    :param {Long integer} value Number to encode.
+    :return {Bytes} Encoded value.
+    """
+    return value.to_bytes(value.bit_length() // 8 + 1, 'big')
+
+
+def hash_to_int(data):
+    """
+    SHA-256 of some bytes as an int, i.e. hex_to_long(hash_sha256(data)).
+    :param {Bytes} data Bytes to hash.
+    :return {Long integer} Digest as a number.
+    """
+    return int.from_bytes(hashlib.sha256(data).digest(), 'big')
+
+
+def mod_pow(base, exponent, modulus):
+    """
+    pow(base, exponent, modulus), through gmpy2 when it is installed.
+    :return {Long integer} Result, always a plain int.
+    """
+    if _powmod is None:
+        return pow(base, exponent, modulus)
+    return int(_powmod(base, exponent, modulus))
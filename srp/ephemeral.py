@@ -0,0 +1,62 @@
+"""
+Pool of pre-generated SRP client ephemerals.
+
+Each login needs a fresh random a and A = g^a % N, a 3072-bit modular
+exponentiation. A pool computes them on a background thread ahead of time, so
+logins in a batch pick up a ready pair instead of computing one first. Every pair
+is handed out once; when the pool is empty the pair is computed on the spot.
+"""
+import os
+import queue
+import threading
+
+from .constants import BIG_N, G, mod_pow
+
+
+def generate_ephemeral():
+    """
+    A random small a and the matching public value A = g^a % N.
+    :return {Tuple} (a, A).
+    """
+    while True:
+        small_a = int.from_bytes(os.urandom(128), 'big') % BIG_N
+        large_a = mod_pow(G, small_a, BIG_N)
+        # safety check, A % N must not be 0
+        if large_a % BIG_N != 0:
+            return small_a, large_a
+
+
+class EphemeralPool(object):
+
+    def __init__(self, size=8):
+        self.size = size
+        self._pairs = queue.Queue(maxsize=size)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start filling the pool in the background (take() also starts it)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._fill, name='srp-ephemeral-pool', daemon=True)
+                self._thread.start()
+        return self
+
+    def _fill(self):
+        while True:
+            # Blocks while the pool is full
+            self._pairs.put(generate_ephemeral())
+
+    def take(self):
+        """
+        A pre-generated (a, A) pair, or a freshly computed one if none is ready.
+        :return {Tuple} (a, A).
+        """
+        self.start()
+        try:
+            return self._pairs.get_nowait()
+        except queue.Empty:
+            return generate_ephemeral()
+
+    def ready(self):
+        return self._pairs.qsize()
@@ -1,10 +0,0 @@
-class WarrantException(Exception):
-    """Base class for all Warrant exceptions"""
-
-
-class ForceChangePasswordException(WarrantException):
-    """Raised when the user is forced to change their password"""
-
-
-class TokenVerificationException(WarrantException):
-    """Raised when token verification fails."""
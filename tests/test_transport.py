@@ -0,0 +1,41 @@
+import pytest
+import requests
+
+from srp.cognito_http import CognitoError
+from transport import CircuitBreaker, ResilientSession, RetryPolicy, call_with_retries
+
+
+class FakeResponse:
+    status_code = 200
+
+
+def open_breaker(host):
+    # Opened, and ready for its half-open trial straight away
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0)
+    breaker.record_failure(host)
+    return breaker
+
+
+def test_a_rejected_login_settles_the_half_open_trial():
+    breaker = open_breaker("cognito")
+
+    def initiate_auth():
+        raise CognitoError("InitiateAuth", "NotAuthorizedException", "Incorrect username or password.")
+
+    with pytest.raises(CognitoError):
+        call_with_retries(initiate_auth, host="cognito", breaker=breaker)
+    assert call_with_retries(lambda: "tokens", host="cognito", breaker=breaker) == "tokens"
+
+
+def test_an_unexpected_error_settles_the_half_open_trial(monkeypatch):
+    session = ResilientSession(RetryPolicy(attempts=1), open_breaker("hub.example"))
+
+    def too_many_redirects(*args, **kwargs):
+        raise requests.TooManyRedirects("Exceeded 30 redirects.")
+
+    monkeypatch.setattr(requests.Session, "request", too_many_redirects)
+    with pytest.raises(requests.TooManyRedirects):
+        session.get("https://hub.example/")
+
+    monkeypatch.setattr(requests.Session, "request", lambda *args, **kwargs: FakeResponse())
+    assert session.get("https://hub.example/").status_code == 200
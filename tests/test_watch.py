@@ -0,0 +1,144 @@
+import json
+import threading
+
+import pytest
+
+import watch
+from catalog_sync import CatalogStore
+from srp.cognito_http import CognitoError
+from transport import HubResponseError
+
+SESSIONS = [{"scheduleUid": "a", "title": "A"}, {"scheduleUid": "b", "title": "B"}]
+
+
+class FakeClient:
+    def user_uid(self):
+        return "user"
+
+
+class FakeHub:
+    """
+    Serves the catalog and the favorites the way download.fetch_if_changed does:
+    None while the body matches the validators, which are updated in place.
+    """
+
+    def __init__(self):
+        self.sessions = list(SESSIONS)
+        self.favorites = ["a"]
+        self.fail_favorites = False
+
+    def fetch_if_changed(self, client, url, validators):
+        if url.startswith(watch.FAVORITES_URL):
+            if self.fail_favorites:
+                raise HubResponseError("Unexpected status 502 from the favorites")
+            data = {"followedSessions": [{"scheduleUid": uid} for uid in self.favorites]}
+        else:
+            data = [dict(session) for session in self.sessions]
+        body = json.dumps(data, sort_keys=True)
+        if validators.get("sha256") == body:
+            return None
+        validators["sha256"] = body
+        return data
+
+
+@pytest.fixture
+def hub(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    hub = FakeHub()
+    monkeypatch.setattr(watch, "fetch_if_changed", hub.fetch_if_changed)
+    return hub
+
+
+@pytest.fixture
+def watcher(hub, tmp_path):
+    return watch.CatalogWatcher(FakeClient(), output=str(tmp_path / "sessions.json"))
+
+
+def written(watcher):
+    return {session["scheduleUid"]: session["isFavorite"] for session in watch.load_sessions(watcher.output)}
+
+
+def fail_once(watcher, monkeypatch, error):
+    calls = []
+    regenerate = watcher.regenerate
+
+    def flaky_regenerate(catalog_changed):
+        calls.append(catalog_changed)
+        if len(calls) == 1:
+            raise error
+        regenerate(catalog_changed)
+
+    monkeypatch.setattr(watcher, "regenerate", flaky_regenerate)
+    return calls
+
+
+@pytest.mark.parametrize("error", [
+    PermissionError(13, "Permission denied", "reinvent.xlsx"),
+    OSError(28, "No space left on device"),
+    CognitoError("InitiateAuth", "NotAuthorizedException", "Incorrect username or password."),
+])
+def test_run_keeps_polling_after_a_failed_poll(watcher, monkeypatch, error):
+    stop = threading.Event()
+    calls = fail_once(watcher, monkeypatch, error)
+    poll = watcher.poll
+
+    def poll_until_written():
+        poll()
+        if len(calls) > 1:
+            stop.set()
+
+    monkeypatch.setattr(watcher, "poll", poll_until_written)
+    watcher.run(interval=0, jitter=0, stop=stop)
+
+    assert len(calls) == 2
+    assert written(watcher) == {"a": True, "b": False}
+
+
+def test_run_stops_on_unexpected_errors(watcher, monkeypatch):
+    def broken_regenerate(catalog_changed):
+        raise TypeError("bug")
+
+    monkeypatch.setattr(watcher, "regenerate", broken_regenerate)
+    with pytest.raises(TypeError):
+        watcher.run(interval=0, jitter=0, stop=threading.Event())
+
+
+def test_catalog_change_survives_a_failed_favorites_fetch(hub, watcher):
+    watcher.poll()
+    hub.sessions.append({"scheduleUid": "c", "title": "C"})
+    hub.fail_favorites = True
+    with pytest.raises(HubResponseError):
+        watcher.poll()
+
+    hub.fail_favorites = False
+    assert watcher.poll()
+    assert written(watcher) == {"a": True, "b": False, "c": False}
+
+
+def test_favorites_change_survives_a_failed_write(hub, watcher, monkeypatch):
+    watcher.poll()
+    hub.favorites = ["b"]
+    fail_once(watcher, monkeypatch, PermissionError(13, "Permission denied", "reinvent.xlsx"))
+    with pytest.raises(PermissionError):
+        watcher.poll()
+
+    assert watcher.poll()
+    assert written(watcher) == {"a": False, "b": True}
+
+
+def test_sync_dir_records_a_change_only_once_it_is_written(hub, tmp_path, monkeypatch):
+    watcher = watch.CatalogWatcher(
+        FakeClient(), output=str(tmp_path / "sessions.json"), sync_dir=str(tmp_path / "store")
+    )
+    watcher.poll()
+    hub.sessions.append({"scheduleUid": "c", "title": "C"})
+    calls = fail_once(watcher, monkeypatch, PermissionError(13, "Permission denied", "reinvent.xlsx"))
+    with pytest.raises(PermissionError):
+        watcher.poll()
+    assert "c" not in CatalogStore(str(tmp_path / "store")).sessions()
+
+    assert watcher.poll()
+    assert calls == [True, True]
+    assert written(watcher) == {"a": True, "b": False, "c": False}
+    assert sorted(CatalogStore(str(tmp_path / "store")).sessions()) == ["a", "b", "c"]
+    assert not watcher.poll()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Span-based timing for the download and export pipeline.
+
+    with tracing.span("fetch.sessions", url=SESSIONS_URL):
+        ...
+        tracing.add("bytes_in", len(body))
+
+Spans nest per thread. Each one records its wall time, the time not spent in
+child spans, numeric counters added while it was current (bytes, requests) and
+the process's peak RSS when it ended. The spans of a run can be written as a
+Chrome/Perfetto trace (JSON) and as Prometheus text-format metrics, e.g. for the
+node_exporter textfile collector.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+METRIC_PREFIX = "reinvent"
+
+
+def peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Span:
+    __slots__ = ("name", "parent", "thread", "start", "end", "child_time", "attrs", "peak_rss")
+
+    def __init__(self, name: str, parent: Optional["Span"], attrs: Dict):
+        self.name = name
+        self.parent = parent
+        self.thread = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.child_time = 0.0
+        self.attrs = attrs
+        self.peak_rss: Optional[int] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    @property
+    def self_time(self) -> float:
+        return self.duration - self.child_time
+
+    def add(self, key: str, amount: float = 1) -> None:
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+
+class Tracer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.spans: List[Span] = []
+        self.started = time.perf_counter()
+
+    def current(self) -> Optional[Span]:
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        current = Span(name, stack[-1] if stack else None, attrs)
+        stack.append(current)
+        try:
+            yield current
+        finally:
+            stack.pop()
+            current.end = time.perf_counter()
+            current.peak_rss = peak_rss_bytes()
+            if current.parent is not None:
+                current.parent.child_time += current.duration
+            with self._lock:
+                self.spans.append(current)
+
+    def add(self, key: str, amount: float = 1) -> None:
+        current = self.current()
+        if current is not None:
+            current.add(key, amount)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.spans = []
+            self.started = time.perf_counter()
+
+    def trace_events(self) -> Dict:
+        """The finished spans in Chrome trace event format (chrome://tracing, ui.perfetto.dev)."""
+        threads: Dict[str, int] = {}
+        events = []
+        for s in sorted(self.spans, key=lambda s: s.start):
+            tid = threads.setdefault(s.thread, len(threads) + 1)
+            events.append({
+                "name": s.name,
+                "ph": "X",
+                "pid": os.getpid(),
+                "tid": tid,
+                "ts": round((s.start - self.started) * 1e6, 1),
+                "dur": round(s.duration * 1e6, 1),
+                "args": {**s.attrs, "self_ms": round(s.self_time * 1000, 3), "peak_rss_bytes": s.peak_rss},
+            })
+        for name, tid in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"peak_rss_bytes": peak_rss_bytes()}}
+
+    def write_trace(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.trace_events(), f)
+
+    def metrics(self) -> str:
+        """Per-stage totals in the Prometheus text exposition format."""
+        seconds: Dict[str, float] = defaultdict(float)
+        self_seconds: Dict[str, float] = defaultdict(float)
+        calls: Dict[str, int] = defaultdict(int)
+        counters: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for s in self.spans:
+            seconds[s.name] += s.duration
+            self_seconds[s.name] += s.self_time
+            calls[s.name] += 1
+            for key, value in s.attrs.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    counters[key][s.name] += value
+
+        lines = []
+
+        def family(metric: str, kind: str, help_text: str, values: Dict[str, float]) -> None:
+            lines.append(f"# HELP {METRIC_PREFIX}_{metric} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{metric} {kind}")
+            for stage in sorted(values):
+                lines.append(f'{METRIC_PREFIX}_{metric}{{stage="{_escape_label(stage)}"}} {values[stage]:g}')
+
+        family("stage_duration_seconds", "gauge", "Wall time spent in each stage.", seconds)
+        family("stage_self_seconds", "gauge", "Time spent in each stage outside its sub-stages.", self_seconds)
+        family("stage_calls", "gauge", "Number of times each stage ran.", calls)
+        for key in sorted(counters):
+            family(f"stage_{_metric_name(key)}", "gauge", f"Total {key} recorded by each stage.", counters[key])
+
+        peak = peak_rss_bytes()
+        if peak is not None:
+            lines.append(f"# HELP {METRIC_PREFIX}_peak_rss_bytes Peak resident set size of the process.")
+            lines.append(f"# TYPE {METRIC_PREFIX}_peak_rss_bytes gauge")
+            lines.append(f"{METRIC_PREFIX}_peak_rss_bytes {peak}")
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path: str) -> None:
+        # Written to a temporary file first so a collector never reads half a file
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.metrics())
+        os.replace(tmp_path, path)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_name(key: str) -> str:
+    return "".join(c if c.isalnum() or c == "_" else "_" for c in key)
+
+
+# The process-wide tracer used by the module-level helpers
+tracer = Tracer()
+
+
+def span(name: str, **attrs):
+    return tracer.span(name, **attrs)
+
+
+def add(key: str, amount: float = 1) -> None:
+    tracer.add(key, amount)
+
+
+def write_outputs(trace_file: Optional[str] = None, metrics_file: Optional[str] = None) -> None:
+    if trace_file:
+        tracer.write_trace(trace_file)
+    if metrics_file:
+        tracer.write_metrics(metrics_file)
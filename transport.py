@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Retries, backoff and a circuit breaker for the hub, storage API and Cognito calls.
+
+Failed requests are retried after an exponentially growing, fully jittered delay
+(or after the server's Retry-After, when it sends one). A per-host circuit breaker
+stops sending requests for a while once a host keeps failing, so an overloaded
+portal is not hit by every retry of every caller at once.
+"""
+import email.utils
+import logging
+import random
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying for any method: the request was not processed
+RETRY_ANY_METHOD = frozenset({429, 503})
+# Statuses only retried for requests that are safe to repeat
+RETRY_IDEMPOTENT = frozenset({500, 502, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Cognito error codes that mean "try again later"
+RETRYABLE_AWS_CODES = frozenset({
+    "TooManyRequestsException",
+    "ThrottlingException",
+    "InternalErrorException",
+    "ServiceUnavailable",
+})
+
+
+class HubResponseError(Exception):
+    """The hub (or the storage API) answered with a status the caller did not expect."""
+
+    def __init__(self, message: str, response: Optional[requests.Response] = None):
+        super().__init__(message)
+        self.response = response
+        self.status_code = response.status_code if response is not None else None
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code is None or self.status_code in RETRY_ANY_METHOD or self.status_code >= 500
+
+
+class CircuitOpenError(Exception):
+    """Requests to a host are on hold because it failed too often in a row."""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"Too many failures talking to {host}, holding off for {retry_after:.0f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+def expect_status(response: requests.Response, *statuses: int) -> requests.Response:
+    if response.status_code not in statuses:
+        raise HubResponseError(
+            f"Response status code should be {' or '.join(map(str, statuses))}, but is {response.status_code}",
+            response,
+        )
+    return response
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """How often to retry, and how long to wait before each retry."""
+
+    def __init__(self, attempts: int = 5, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        # "Full jitter": a random wait up to the exponential backoff for this attempt
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            return max(backoff, min(retry_after, self.max_delay))
+        return backoff
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker: after `failure_threshold` failures in a row the host is given
+    `reset_after` seconds off, then a single trial request decides whether it is
+    back (closed) or needs more time (open again).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        self._trial_running: Dict[str, bool] = {}
+
+    def before_request(self, host: str) -> None:
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return
+            remaining = opened_at + self.reset_after - time.monotonic()
+            if remaining > 0 or self._trial_running.get(host):
+                raise CircuitOpenError(host, max(remaining, 1.0))
+            self._trial_running[host] = True
+
+    def record_success(self, host: str) -> None:
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._trial_running.pop(host, None)
+
+    def record_failure(self, host: str) -> None:
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if failures >= self.failure_threshold or self._trial_running.get(host):
+                if host not in self._opened_at or self._trial_running.get(host):
+                    logger.warning(f"Circuit opened for {host} after {failures} failures")
+                self._opened_at[host] = time.monotonic()
+                self._trial_running.pop(host, None)
+
+
+class ResilientSession(requests.Session):
+    """
+    requests.Session whose every request goes through the circuit breaker and is
+    retried on connection errors, 429/503 and (for GET/HEAD) other 5xx responses.
+    After the last attempt the final response is returned for the caller to check.
+    """
+
+    def __init__(self, policy: Optional[RetryPolicy] = None, breaker: Optional[CircuitBreaker] = None):
+        super().__init__()
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+
+    def request(self, method, url, *args, **kwargs):
+        host = urlparse(url).netloc
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        for attempt in range(self.policy.attempts):
+            last_attempt = attempt == self.policy.attempts - 1
+            self.breaker.before_request(host)
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.breaker.record_failure(host)
+                # Only a failed connect is known not to have reached the server
+                if last_attempt or not (idempotent or isinstance(e, requests.ConnectTimeout)):
+                    raise
+                wait = self.policy.delay(attempt)
+                logger.info(f" - {method} {host} failed ({e.__class__.__name__}), retrying in {wait:.1f}s")
+                time.sleep(wait)
+                continue
+            except BaseException:
+                # Anything else still has to settle a half-open trial, or the circuit stays open
+                self.breaker.record_failure(host)
+                raise
+
+            status = response.status_code
+            if status in RETRY_ANY_METHOD or (idempotent and status in RETRY_IDEMPOTENT):
+                self.breaker.record_failure(host)
+                if last_attempt:
+                    return response
+                wait = self.policy.delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+                logger.info(f" - {method} {host} returned {status}, retrying in {wait:.1f}s")
+                response.close()
+                time.sleep(wait)
+                continue
+
+            self.breaker.record_success(host)
+            return response
+
+
+def is_retryable_aws_error(error: Exception) -> bool:
+    """
+    Whether a Cognito call failed in a way worth retrying, for both boto3 and
+    srp.cognito_http errors (which carry the code the same way). botocore is only
+    consulted if something else already imported it.
+    """
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    botocore_exceptions = sys.modules.get("botocore.exceptions")
+    if botocore_exceptions is not None and isinstance(error, botocore_exceptions.ConnectionError):
+        return True
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code") in RETRYABLE_AWS_CODES
+    return False
+
+
+def is_aws_error(error: Exception) -> bool:
+    """
+    Whether `error` is an error answer from Cognito, from boto3 or srp.cognito_http.
+    As above, botocore is only consulted if something else already imported it.
+    """
+    botocore_exceptions = sys.modules.get("botocore.exceptions")
+    if botocore_exceptions is not None and isinstance(
+        error, (botocore_exceptions.ClientError, botocore_exceptions.BotoCoreError)
+    ):
+        return True
+    return isinstance(getattr(error, "response", None), dict)
+
+
+def call_with_retries(
+    call: Callable,
+    *args,
+    host: str = "",
+    policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    retryable: Callable[[Exception], bool] = is_retryable_aws_error,
+    **kwargs,
+):
+    """
+    Call `call(*args, **kwargs)`, retrying with backoff while it raises errors that
+    `retryable` accepts (Cognito throttling and connection errors by default).
+    """
+    policy = policy or RetryPolicy()
+    for attempt in range(policy.attempts):
+        if breaker is not None:
+            breaker.before_request(host)
+        try:
+            result = call(*args, **kwargs)
+        except Exception as e:
+            if not retryable(e):
+                # e.g. a wrong password: the host answered, so it is up
+                if breaker is not None:
+                    breaker.record_success(host)
+                raise
+            if breaker is not None:
+                breaker.record_failure(host)
+            if attempt == policy.attempts - 1:
+                raise
+            wait = policy.delay(attempt)
+            logger.info(f" - {host or 'call'} failed ({e.__class__.__name__}), retrying in {wait:.1f}s")
+            time.sleep(wait)
+            continue
+        except BaseException:
+            if breaker is not None:
+                breaker.record_failure(host)
+            raise
+        if breaker is not None:
+            breaker.record_success(host)
+        return result
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed login step is worth resuming rather than starting over."""
+    if isinstance(error, HubResponseError):
+        return error.retryable
+    if isinstance(error, (CircuitOpenError, requests.ConnectionError, requests.Timeout)):
+        return True
+    return is_retryable_aws_error(error)
+
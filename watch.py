@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Keep one logged-in hub session open and poll the catalog and favorites.
+
+Each poll is a conditional GET of the sessions list and of the favorites (see
+download.fetch_if_changed), so an unchanged catalog costs two small requests. Only
+the outputs affected by a change are regenerated: the sessions file and the
+workbook when the catalog or the favorites changed, the search index only when
+the catalog did. The process pays for start-up and the login once; an expired hub
+session is logged in again by HubClient as soon as a request is rejected.
+"""
+import argparse
+import logging
+import random
+import signal
+import threading
+from typing import Dict, List, Optional, Sequence, Set
+
+import click
+import requests
+
+import tracing
+from catalog_storage import load_sessions, save_sessions
+from catalog_sync import CatalogStore
+from credential_cache import CredentialCache, DEFAULT_CACHE_DIR
+from display import parse_groupings, read_excel_source, write_workbook
+from download import (
+    FAVORITES_URL,
+    SESSIONS_FILE,
+    SESSIONS_URL,
+    HubClient,
+    fetch_if_changed,
+    load_saved_sessions,
+    load_validators,
+    save_validators,
+)
+from normalize import normalize_sessions
+from search_index import SearchIndex
+from transport import CircuitOpenError, HubResponseError, is_aws_error
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogWatcher:
+    """
+    Polls the hub through one HubClient and rewrites the outputs that a change affects.
+    `workbook` and `index` are optional; None leaves that output alone.
+    """
+
+    def __init__(
+        self,
+        client: HubClient,
+        output: str = SESSIONS_FILE,
+        workbook: Optional[str] = None,
+        source_file: str = "",
+        split: Sequence[str] = (),
+        workers: Optional[int] = None,
+        incremental: bool = True,
+        index: Optional[str] = None,
+        sync_dir: Optional[str] = None,
+    ):
+        self.client = client
+        self.output = output
+        self.workbook = workbook
+        self.source_file = source_file
+        self.split = split
+        self.workers = workers
+        self.incremental = incremental
+        self.index = index
+        self.store = CatalogStore(sync_dir) if sync_dir is not None else None
+        # ETag/Last-Modified/body hash of the last responses, shared with download.py --conditional
+        self.validators: Dict = load_validators(output)
+        self.sessions: Optional[List[Dict]] = None
+        self.favorite_uids: Optional[Set[str]] = None
+
+    def poll(self) -> bool:
+        """
+        Fetch whatever changed since the last poll and regenerate the affected outputs.
+        Returns whether anything changed.
+
+        Nothing is kept from a poll that fails: the validators, the catalog store and
+        the sessions and favorites held here are only updated once the outputs have
+        been written, so the next poll fetches the same changes and tries again.
+        """
+        client = self.client
+        # Fetch into copies, so a failure below leaves the validators of the last good poll
+        validators = {name: dict(self.validators.get(name, {})) for name in ("sessions", "favorites")}
+        with tracing.span("poll"):
+            sessions_data = fetch_if_changed(client, SESSIONS_URL, validators["sessions"])
+            favorites_data = fetch_if_changed(
+                client, FAVORITES_URL + client.user_uid(), validators["favorites"]
+            )
+
+        catalog_changed = sessions_data is not None
+        changes = None
+        sessions = self.sessions
+        if sessions_data is None and sessions is None:
+            # First poll and the catalog on disk is still current
+            sessions_data = load_saved_sessions(self.output)
+        if sessions_data is not None:
+            if self.store is not None:
+                changes = self.store.diff(sessions_data)
+                logger.info(f"Catalog changes: {changes.summary()}")
+                catalog_changed = catalog_changed and bool(changes)
+            sessions = sessions_data
+
+        favorite_uids = self.favorite_uids
+        favorites_changed = False
+        if favorites_data is None and favorite_uids is None:
+            # First poll and the favorites are unchanged: they are the ones flagged on disk
+            favorite_uids = {
+                session["scheduleUid"] for session in load_sessions(self.output) if session.get("isFavorite")
+            }
+        elif favorites_data is not None:
+            favorite_uids = {
+                favorite_session["scheduleUid"]
+                for favorite_session in favorites_data.get("followedSessions", [])
+            }
+            favorites_changed = favorite_uids != self.favorite_uids
+
+        previous = self.sessions, self.favorite_uids
+        self.sessions, self.favorite_uids = sessions, favorite_uids
+        if catalog_changed or favorites_changed:
+            changed = [name for name, flag in (("catalog", catalog_changed), ("favorites", favorites_changed)) if flag]
+            logger.info(f"Changed: {', '.join(changed)}")
+            try:
+                self.regenerate(catalog_changed)
+            except Exception:
+                self.sessions, self.favorite_uids = previous
+                raise
+        if changes:
+            self.store.record(changes)
+        self.validators = validators
+        save_validators(self.validators, self.output)
+        return catalog_changed or favorites_changed
+
+    def regenerate(self, catalog_changed: bool) -> None:
+        with tracing.span("merge_favorites"):
+            for session in self.sessions:
+                session["isFavorite"] = session["scheduleUid"] in self.favorite_uids
+        with tracing.span("sort"):
+            sessions = sorted(self.sessions, key=lambda d: d["title"])
+        with tracing.span("write", sessions=len(sessions)):
+            save_sessions(self.output, sessions)
+        logger.info(f" - {len(sessions)} sessions written to {self.output}")
+
+        if self.workbook is not None:
+            with tracing.span("excel.read"):
+                favourites_data, is_selected_data = read_excel_source(self.source_file)
+            with tracing.span("parse_sessions", sessions=len(sessions)):
+                table = normalize_sessions(sessions, favourites_data, is_selected_data)
+            with tracing.span("excel.write"):
+                write_workbook(self.workbook, table, self.split, self.workers, incremental=self.incremental)
+            logger.info(f" - {self.workbook} regenerated")
+
+        # Favourite flags are not indexed, so only catalog changes touch the index
+        if self.index is not None and catalog_changed:
+            with tracing.span("search_index"), SearchIndex(self.index) as search_index:
+                added, updated, removed = search_index.update(sessions)
+            logger.info(f" - Search index: {added} added, {updated} updated, {removed} removed")
+
+    def run(self, interval: float, jitter: float, stop: threading.Event, metrics_file: Optional[str] = None) -> None:
+        while not stop.is_set():
+            delay = interval + random.uniform(0, jitter)
+            # Keep only the spans of this poll, so memory does not grow with uptime
+            tracing.tracer.reset()
+            try:
+                self.poll()
+            except CircuitOpenError as e:
+                logger.warning(f"Poll skipped: {e}")
+                delay = max(delay, e.retry_after)
+            except (HubResponseError, requests.RequestException, ValueError, KeyError) as e:
+                # Already retried with backoff by the transport; try again next interval
+                logger.warning(f"Poll failed: {e}")
+            except OSError as e:
+                # e.g. the workbook is open in Excel or the disk is full; poll() has kept
+                # nothing from this poll, so the next one fetches the same changes again
+                logger.warning(f"Could not write the outputs: {e}")
+            except Exception as e:
+                # A Cognito error during the automatic re-login (wrong password, throttling)
+                if not is_aws_error(e):
+                    raise
+                logger.warning(f"Login failed: {e}")
+            if metrics_file:
+                tracing.tracer.write_metrics(metrics_file)
+            logger.info(f"Next poll in {delay:.0f}s")
+            stop.wait(delay)
+
+
+def parse_split(ctx, param, value):
+    try:
+        return parse_groupings(value)
+    except argparse.ArgumentTypeError as e:
+        raise click.BadParameter(str(e))
+
+
+@click.command()
+@click.option('--username', prompt='AWS Portal username',
+            help='Your AWS re:Invent portal account username.')
+@click.option(
+    "--password", prompt='AWS Portal password', hide_input=True,
+    help='Your AWS re:Invent portal account password.'
+)
+@click.option(
+    "--interval", default=50.0, show_default=True,
+    help='Seconds between polls.'
+)
+@click.option(
+    "--jitter", default=10.0, show_default=True,
+    help='Up to this many seconds are added at random to each interval, so several watchers do not poll in step.'
+)
+@click.option(
+    "--output", default=SESSIONS_FILE, show_default=True,
+    help='Catalog file rewritten on every change (.json, .min.json, .msgpack or .sqlite).'
+)
+@click.option(
+    "--workbook", default="reinvent.xlsx", show_default=True,
+    help='Workbook regenerated on every change, as display.py writes it.'
+)
+@click.option(
+    "--no-workbook", is_flag=True, default=False,
+    help='Do not write a workbook.'
+)
+@click.option(
+    "--source-file", default="",
+    help='Previous workbook whose Selected and Favourite columns are carried over, as for display.py.'
+)
+@click.option(
+    "--split", default="", callback=parse_split,
+    help='Also add a worksheet per group to the workbook, e.g. track,day (see display.py --split).'
+)
+@click.option(
+    "--workers", type=int, default=None,
+    help='Processes used to render worksheets with --split (default: one per CPU).'
+)
+@click.option(
+    "--incremental/--full-export", default=True, show_default=True,
+    help='Re-render only the workbook rows that changed (see display.py --incremental), or rewrite it all.'
+)
+@click.option(
+    "--index", default=None,
+    help='Full-text search index to update when the catalog changes, e.g. search_index.sqlite (see query.py).'
+)
+@click.option(
+    "--sync-dir", default=None,
+    help='Record the sessions added, modified and removed by each change in this catalog store.'
+)
+@click.option(
+    "--cache-credentials/--no-cache-credentials", default=False,
+    help='Keep the hub cookies and Cognito tokens in an encrypted local cache, so a restart skips the login.'
+)
+@click.option(
+    "--cache-dir", default=DEFAULT_CACHE_DIR, show_default=True,
+    help='Directory for the encrypted credential cache.'
+)
+@click.option(
+    "--cognito-client", type=click.Choice(["boto3", "http"]), default="boto3", show_default=True,
+    help='Log in to Cognito through boto3, or through a small built-in HTTP client.'
+)
+@click.option(
+    "--metrics-file", default=None,
+    help='After every poll, rewrite the durations of its stages and the peak memory in the Prometheus text format.'
+)
+def main(username, password, interval, jitter, output, workbook, no_workbook, source_file, split, workers, incremental, index, sync_dir, cache_credentials, cache_dir, cognito_client, metrics_file):
+    stop = threading.Event()
+    # Finish the poll in progress, then exit
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+
+    cache = CredentialCache(username, password, cache_dir) if cache_credentials else None
+    with HubClient(username, password, cache, cognito=cognito_client) as client:
+        watcher = CatalogWatcher(
+            client,
+            output=output,
+            workbook=None if no_workbook else workbook,
+            source_file=source_file,
+            split=split,
+            workers=workers,
+            incremental=incremental,
+            index=index,
+            sync_dir=sync_dir,
+        )
+        logger.info(f"Watching the catalog every {interval:.0f}-{interval + jitter:.0f}s")
+        try:
+            watcher.run(interval, jitter, stop, metrics_file)
+        except KeyboardInterrupt:
+            pass
+    logger.info("Stopped")
+
+
+if __name__ == "__main__":
+    main()
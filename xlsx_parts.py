@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Minimal SpreadsheetML (xlsx) writer that works on pre-rendered row fragments.
+
+Rows are written without cell or row references (both are optional in the
+format), so the XML for a row is the same whichever worksheet it lands in and
+can be rendered once, in any process, and reused by every sheet containing it.
+
+Text is written inline, except SharedString cells, which refer to an entry of
+the workbook's shared strings part by index.
+"""
+import re
+import shutil
+import zipfile
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+from xml.sax.saxutils import escape, quoteattr
+
+# Indexes into cellXfs in STYLES_XML
+STYLE_CELL = 1       # wrapped text, 12pt
+STYLE_FAVOURITE = 2  # unwrapped text, 12pt
+STYLE_HEADER = 3     # bold wrapped text, 12pt
+
+DEFAULT_ROW_HEIGHT = 20
+
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+CONTENT_TYPES_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"><Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/><Default Extension="xml" ContentType="application/xml"/><Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/><Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>{sheets}</Types>"""
+
+SHEET_CONTENT_TYPE = """<Override PartName="/xl/worksheets/sheet{n}.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>"""
+
+SHARED_STRINGS_CONTENT_TYPE = """<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>"""
+
+ROOT_RELS_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/></Relationships>"""
+
+WORKBOOK_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>{sheets}</sheets></workbook>"""
+
+WORKBOOK_RELS_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{sheets}<Relationship Id="rIdStyles" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/></Relationships>"""
+
+STYLES_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><fonts count="3"><font><sz val="11"/><name val="Calibri"/><family val="2"/></font><font><sz val="12"/><name val="Calibri"/><family val="2"/></font><font><b/><sz val="12"/><name val="Calibri"/><family val="2"/></font></fonts><fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills><borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders><cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs><cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/><xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1" applyAlignment="1"><alignment wrapText="1"/></xf><xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/><xf numFmtId="0" fontId="2" fillId="0" borderId="0" xfId="0" applyFont="1" applyAlignment="1"><alignment wrapText="1"/></xf></cellXfs><cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles></styleSheet>"""
+
+SHARED_STRINGS_REL = """<Relationship Id="rIdSharedStrings" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>"""
+
+SHARED_STRINGS_HEAD_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" uniqueCount="{count}">"""
+
+SHEET_HEAD_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetFormatPr defaultRowHeight="{height}" customHeight="1"/><cols>{cols}</cols><sheetData>"""
+
+SHEET_TAIL_XML = "</sheetData></worksheet>"
+
+COPY_CHUNK_SIZE = 1 << 20
+
+
+class SharedString(int):
+    """A cell value that is an index into the shared strings given to write_workbook."""
+
+
+class PreviousPart:
+    """
+    Stands in for a sheet's row fragments in write_workbook: the sheet is copied
+    as it is from worksheet part `name` of the `previous` workbook.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+def sheet_part(n: int) -> str:
+    return f"xl/worksheets/sheet{n}.xml"
+
+
+def _escape_text(value: str) -> str:
+    # Control characters are not allowed in XML; Excel's own escape for them is _xHHHH_
+    value = _ILLEGAL_XML_CHARS.sub(lambda m: f"_x{ord(m.group()):04X}_", value)
+    return escape(value)
+
+
+def cell_xml(value, style: int) -> str:
+    if value is None or value == "":
+        return f'<c s="{style}"/>'
+    if isinstance(value, SharedString):
+        return f'<c s="{style}" t="s"><v>{int(value)}</v></c>'
+    if isinstance(value, bool):
+        return f'<c s="{style}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c s="{style}"><v>{value!r}</v></c>'
+    return f'<c s="{style}" t="inlineStr"><is><t xml:space="preserve">{_escape_text(str(value))}</t></is></c>'
+
+
+def row_xml(values: Sequence, style: int = STYLE_CELL) -> bytes:
+    return ("<row>" + "".join(cell_xml(v, style) for v in values) + "</row>").encode("utf-8")
+
+
+def header_xml(names: Sequence[str]) -> bytes:
+    return row_xml(names, STYLE_HEADER)
+
+
+def sheet_name(name: str, used: set) -> str:
+    """A valid, unique (case-insensitively) worksheet name of at most 31 characters."""
+    base = _INVALID_SHEET_CHARS.sub("_", name).strip("'")[:31] or "Sheet"
+    candidate = base
+    n = 2
+    while candidate.lower() in used:
+        suffix = f" ({n})"
+        candidate = base[: 31 - len(suffix)] + suffix
+        n += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def sheet_head(columns: Sequence[Tuple[str, float]]) -> bytes:
+    """Worksheet XML up to and including the header row, for (header, width) columns."""
+    cols = "".join(
+        f'<col min="{i}" max="{i}" width="{width + 0.7109375}" customWidth="1"/>'
+        for i, (_, width) in enumerate(columns, start=1)
+    )
+    head = SHEET_HEAD_XML.format(height=DEFAULT_ROW_HEIGHT, cols=cols).encode("utf-8")
+    return head + header_xml([name for name, _ in columns])
+
+
+def shared_strings_xml(strings: Sequence[str]) -> bytes:
+    items = "".join(f'<si><t xml:space="preserve">{_escape_text(value)}</t></si>' for value in strings)
+    return (SHARED_STRINGS_HEAD_XML.format(count=len(strings)) + items + "</sst>").encode("utf-8")
+
+
+def read_rows(workbook: zipfile.ZipFile, part: str) -> List[bytes]:
+    """
+    The row fragments of a worksheet part written by write_workbook, header row excluded.
+    Rows carry no references and their text is escaped, so splitting on </row> is exact.
+    """
+    data = workbook.read(part)
+    start = data.index(b"<sheetData>") + len(b"<sheetData>")
+    end = data.rindex(b"</sheetData>")
+    rows = data[start:end].split(b"</row>")
+    # rows[0] is the header, rows[-1] the empty remainder after the last </row>
+    return [row + b"</row>" for row in rows[1:-1]]
+
+
+def copy_part(source: zipfile.ZipFile, target: zipfile.ZipFile, name: str, arcname: str) -> None:
+    """
+    Add member `name` of `source` to `target` as `arcname`, streamed through a chunk at
+    a time, so the part is never held in memory and its rows are not rendered again.
+    """
+    with source.open(name) as src, target.open(arcname, "w", force_zip64=True) as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+
+def write_workbook(
+    path: str,
+    sheets: Sequence[Tuple[str, Sequence[Tuple[str, float]], Union[Iterable[bytes], PreviousPart]]],
+    previous: Optional[zipfile.ZipFile] = None,
+    shared_strings: Sequence[str] = (),
+) -> None:
+    """
+    Write an xlsx file at `path`. Each sheet is (name, columns, row fragments), where
+    columns holds the (header, width) pairs used for the header row and column widths.
+    Fragments are streamed into the compressed worksheet parts, never joined up in memory.
+    Instead of fragments a sheet can give a PreviousPart of the `previous` workbook,
+    which is copied as it is. SharedString cells index into `shared_strings`.
+    """
+    used: set = set()
+    names: List[str] = [sheet_name(name, used) for name, _, _ in sheets]
+
+    # Level 1 deflate is about three times faster than the default for a slightly larger file
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        zf.writestr(
+            "[Content_Types].xml",
+            CONTENT_TYPES_XML.format(
+                sheets="".join(SHEET_CONTENT_TYPE.format(n=n) for n in range(1, len(sheets) + 1))
+                + (SHARED_STRINGS_CONTENT_TYPE if shared_strings else "")
+            ),
+        )
+        zf.writestr("_rels/.rels", ROOT_RELS_XML)
+        zf.writestr(
+            "xl/workbook.xml",
+            WORKBOOK_XML.format(
+                sheets="".join(
+                    f'<sheet name={quoteattr(name)} sheetId="{n}" r:id="rId{n}"/>'
+                    for n, name in enumerate(names, start=1)
+                )
+            ),
+        )
+        zf.writestr(
+            "xl/_rels/workbook.xml.rels",
+            WORKBOOK_RELS_XML.format(
+                sheets="".join(
+                    f'<Relationship Id="rId{n}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet{n}.xml"/>'
+                    for n in range(1, len(sheets) + 1)
+                )
+                + (SHARED_STRINGS_REL if shared_strings else "")
+            ),
+        )
+        zf.writestr("xl/styles.xml", STYLES_XML)
+        if shared_strings:
+            zf.writestr("xl/sharedStrings.xml", shared_strings_xml(shared_strings))
+        for n, (_, columns, fragments) in enumerate(sheets, start=1):
+            if isinstance(fragments, PreviousPart):
+                copy_part(previous, zf, fragments.name, sheet_part(n))
+                continue
+            with zf.open(sheet_part(n), "w", force_zip64=True) as part:
+                part.write(sheet_head(columns))
+                # Hand the compressor ~1MB at a time rather than one small row at a time
+                pending: List[bytes] = []
+                pending_size = 0
+                for fragment in fragments:
+                    pending.append(fragment)
+                    pending_size += len(fragment)
+                    if pending_size >= 1 << 20:
+                        part.write(b"".join(pending))
+                        pending.clear()
+                        pending_size = 0
+                pending.append(SHEET_TAIL_XML.encode("utf-8"))
+                part.write(b"".join(pending))